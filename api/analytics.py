@@ -0,0 +1,139 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, time, timedelta
+import numpy as np
+import pandas as pd
+from django.utils import timezone
+from .models import AttendanceLog, Student
+from .schedule_utils import get_all_schedules
+
+LOAD_CHUNK_SIZE = 50000
+MAX_CACHED_SEGMENTS = 400
+SEGMENT_COLUMNS = ('student_id', 'timestamp', 'bus_number', 'direction', 'status')
+
+_segment_cache = OrderedDict()
+_segment_lock = threading.Lock()
+
+
+def _rows_to_frame(rows):
+    student_ids, timestamps, bus_numbers, directions, statuses = zip(*rows) if rows else ((), (), (), (), ())
+    return pd.DataFrame({
+        'student_id': np.asarray(student_ids, dtype=np.int64),
+        'timestamp': pd.to_datetime(list(timestamps), utc=True),
+        'bus_number': pd.Categorical(bus_numbers),
+        'direction': pd.Categorical(directions, categories=AttendanceLog.BusDirection.values),
+        'status': pd.Categorical(statuses, categories=AttendanceLog.ScanStatus.values),
+    })
+
+def load_day_segments(days):
+    """
+    Reads AttendanceLog columns for the given local days in chunks of
+    LOAD_CHUNK_SIZE rows and splits them into one frame per day.
+    """
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(min(days), time.min), tz)
+    end = timezone.make_aware(datetime.combine(max(days) + timedelta(days=1), time.min), tz)
+
+    queryset = AttendanceLog.objects.filter(timestamp__gte=start, timestamp__lt=end).order_by().values_list(*SEGMENT_COLUMNS)
+
+    chunks = []
+    rows = []
+    for row in queryset.iterator(chunk_size=LOAD_CHUNK_SIZE):
+        rows.append(row)
+        if len(rows) >= LOAD_CHUNK_SIZE:
+            chunks.append(_rows_to_frame(rows))
+            rows = []
+    chunks.append(_rows_to_frame(rows))
+
+    frame = pd.concat(chunks, ignore_index=True)
+    local_days = frame['timestamp'].dt.tz_convert(tz).dt.date
+
+    segments = {day: frame.iloc[0:0] for day in days}
+    for day, segment in frame.groupby(local_days, sort=False):
+        if day in segments:
+            segments[day] = segment.reset_index(drop=True)
+    return segments
+
+def load_attendance_frame(from_date, to_date):
+    """
+    Columnar AttendanceLog data for [from_date, to_date]. Completed days are
+    cached as per-day segments that are never modified after loading; today
+    is always re-read because scans are still arriving.
+    """
+    today = timezone.localdate()
+    days = [from_date + timedelta(days=offset) for offset in range((to_date - from_date).days + 1)]
+
+    segments = {}
+    with _segment_lock:
+        for day in days:
+            if day in _segment_cache:
+                _segment_cache.move_to_end(day)
+                segments[day] = _segment_cache[day]
+
+    missing_days = [day for day in days if day not in segments]
+    if missing_days:
+        loaded = load_day_segments(missing_days)
+        segments.update(loaded)
+        with _segment_lock:
+            for day, segment in loaded.items():
+                if day < today:
+                    _segment_cache[day] = segment
+            while len(_segment_cache) > MAX_CACHED_SEGMENTS:
+                _segment_cache.popitem(last=False)
+
+    frames = [segments[day] for day in days]
+    if not frames:
+        return _rows_to_frame([])
+    return pd.concat(frames, ignore_index=True)
+
+def _schedule_metadata():
+    schedules = get_all_schedules()
+    return pd.DataFrame(
+        [(schedule_id, data.get('course'), data.get('year')) for schedule_id, data in schedules.items()],
+        columns=['schedule_id', 'course', 'year']
+    )
+
+def _records(frame):
+    return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+def compute_attendance_metrics(from_date, to_date):
+    frame = load_attendance_frame(from_date, to_date)
+    tz = timezone.get_current_timezone()
+
+    student_schedules = pd.Series(dict(Student.objects.values_list('id', 'schedule_id')), dtype=object)
+    schedule_ids = frame['student_id'].map(student_schedules).fillna('NONE')
+    is_invalid = (frame['status'] == AttendanceLog.ScanStatus.INVALID).to_numpy()
+    is_override = (frame['status'] == AttendanceLog.ScanStatus.OVERRIDE).to_numpy()
+
+    by_schedule = (
+        pd.DataFrame({'schedule_id': schedule_ids, 'invalid': is_invalid})
+        .groupby('schedule_id', sort=True)
+        .agg(scans=('invalid', 'size'), invalid_scans=('invalid', 'sum'))
+        .reset_index()
+    )
+    by_schedule['invalid_rate'] = (by_schedule['invalid_scans'] / by_schedule['scans']).round(4)
+    by_schedule = by_schedule.merge(_schedule_metadata(), on='schedule_id', how='left')
+
+    local_timestamps = frame['timestamp'].dt.tz_convert(tz)
+    week_starts = (local_timestamps.dt.normalize() - pd.to_timedelta(local_timestamps.dt.weekday, unit='D')).dt.date
+    overrides_by_week = (
+        pd.DataFrame({'week_start': week_starts, 'override': is_override})
+        .groupby('week_start', sort=True)
+        .agg(scans=('override', 'size'), override_scans=('override', 'sum'))
+        .reset_index()
+    )
+    overrides_by_week['override_rate'] = (overrides_by_week['override_scans'] / overrides_by_week['scans']).round(4)
+
+    direction_by_day = pd.crosstab(local_timestamps.dt.date, frame['direction'], dropna=False)
+    direction_by_day = direction_by_day.reindex(columns=AttendanceLog.BusDirection.values, fill_value=0)
+    direction_by_day['balance'] = direction_by_day['INBOUND'] - direction_by_day['OUTBOUND']
+    direction_by_day = direction_by_day.rename_axis('date').rename_axis(None, axis=1).reset_index()
+
+    return {
+        "from_date": from_date,
+        "to_date": to_date,
+        "total_scans": int(len(frame)),
+        "invalid_rate_by_schedule": _records(by_schedule),
+        "override_usage_by_week": _records(overrides_by_week),
+        "direction_balance_by_day": _records(direction_by_day),
+    }
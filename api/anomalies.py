@@ -0,0 +1,134 @@
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+import numpy as np
+import pandas as pd
+from django.utils import timezone
+from .analytics import load_day_segments
+from .models import AttendanceAnomaly, AttendanceLog
+
+
+@dataclass(frozen=True)
+class AnomalyThresholds:
+    invalid_scans: int = 3
+    sharing_window_minutes: int = 10
+    override_rate_factor: float = 3.0
+    min_overrides: int = 5
+
+
+def _finding(kind, day, student_id=None, bus_number=None, **details):
+    return {
+        "kind": kind,
+        "student_id": student_id,
+        "bus_number": bus_number,
+        "date": day,
+        "details": details,
+    }
+
+def detect_repeated_invalid(frame, day, thresholds):
+    invalid_counts = frame.loc[frame['status'] == AttendanceLog.ScanStatus.INVALID, 'student_id'].value_counts()
+    flagged = invalid_counts[invalid_counts >= thresholds.invalid_scans]
+    return [
+        _finding(AttendanceAnomaly.AnomalyKind.REPEATED_INVALID, day, student_id=int(student_id), invalid_scans=int(count))
+        for student_id, count in flagged.items()
+    ]
+
+def detect_card_sharing(frame, carry, day, thresholds):
+    """
+    Flags consecutive scans of the same card on different buses within the
+    sharing window. carry holds the previous day's last few minutes so pairs
+    straddling midnight are still seen; only pairs whose later scan falls on
+    `day` are reported.
+    """
+    combined = pd.concat([carry.assign(in_day=False), frame.assign(in_day=True)], ignore_index=True)
+    if len(combined) < 2:
+        return []
+
+    student_ids = combined['student_id'].to_numpy()
+    timestamps = combined['timestamp'].dt.tz_localize(None).to_numpy().astype('datetime64[ns]').astype(np.int64)
+    order = np.lexsort((timestamps, student_ids))
+
+    student_ids = student_ids[order]
+    timestamps = timestamps[order]
+    bus_numbers = combined['bus_number'].astype(object).to_numpy()[order]
+    in_day = combined['in_day'].to_numpy()[order]
+
+    window_ns = thresholds.sharing_window_minutes * 60 * 10**9
+    has_bus = pd.notna(bus_numbers)
+    pair_mask = (
+        (student_ids[1:] == student_ids[:-1])
+        & (timestamps[1:] - timestamps[:-1] <= window_ns)
+        & has_bus[1:] & has_bus[:-1]
+        & (bus_numbers[1:] != bus_numbers[:-1])
+        & in_day[1:]
+    )
+
+    pairs_by_student = {}
+    for index in np.flatnonzero(pair_mask):
+        pairs_by_student.setdefault(int(student_ids[index]), []).append({
+            "first_bus": bus_numbers[index],
+            "second_bus": bus_numbers[index + 1],
+            "first_scan": pd.Timestamp(timestamps[index], tz='UTC').isoformat(),
+            "second_scan": pd.Timestamp(timestamps[index + 1], tz='UTC').isoformat(),
+        })
+
+    return [
+        _finding(AttendanceAnomaly.AnomalyKind.CARD_SHARING, day, student_id=student_id, pairs=pairs[:20], pair_count=len(pairs))
+        for student_id, pairs in pairs_by_student.items()
+    ]
+
+def detect_override_rate(frame, day, thresholds):
+    if frame.empty:
+        return []
+
+    is_override = (frame['status'] == AttendanceLog.ScanStatus.OVERRIDE).to_numpy()
+    per_bus = (
+        pd.DataFrame({'bus_number': frame['bus_number'].astype(object), 'override': is_override})
+        .dropna(subset=['bus_number'])
+        .groupby('bus_number')
+        .agg(scans=('override', 'size'), overrides=('override', 'sum'))
+    )
+    if per_bus.empty:
+        return []
+
+    day_rate = per_bus['overrides'].sum() / per_bus['scans'].sum()
+    per_bus['rate'] = per_bus['overrides'] / per_bus['scans']
+    flagged = per_bus[
+        (per_bus['overrides'] >= thresholds.min_overrides)
+        & (per_bus['rate'] >= day_rate * thresholds.override_rate_factor)
+    ]
+
+    return [
+        _finding(
+            AttendanceAnomaly.AnomalyKind.OVERRIDE_RATE, day, bus_number=bus_number,
+            scans=int(row.scans), overrides=int(row.overrides),
+            override_rate=round(float(row.rate), 4), day_override_rate=round(float(day_rate), 4)
+        )
+        for bus_number, row in per_bus.loc[flagged.index].iterrows()
+    ]
+
+def _day_tail(segment, day, minutes):
+    tz = timezone.get_current_timezone()
+    day_end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min), tz)
+    cutoff = pd.Timestamp(day_end - timedelta(minutes=minutes))
+    return segment[segment['timestamp'] >= cutoff]
+
+def detect_anomalies_for_days(days, thresholds):
+    """
+    Runs every detector over a contiguous run of days, one day in memory at a
+    time. Meant to be mapped across a process pool, one run of days per task.
+    """
+    previous_day = days[0] - timedelta(days=1)
+    carry = _day_tail(load_day_segments([previous_day])[previous_day], previous_day, thresholds.sharing_window_minutes)
+
+    findings = []
+    for day in days:
+        segment = load_day_segments([day])[day]
+        findings.extend(detect_repeated_invalid(segment, day, thresholds))
+        findings.extend(detect_card_sharing(segment, carry, day, thresholds))
+        findings.extend(detect_override_rate(segment, day, thresholds))
+        carry = _day_tail(segment, day, thresholds.sharing_window_minutes)
+    return findings
+
+def init_worker():
+    import django
+    django.setup()
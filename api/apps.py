@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+        from . import signals
+        from .events import scan_event_hub
+        from .ridership import ridership_counters
+        from .querystats import install_query_stats
+
+        scan_event_hub.add_listener(ridership_counters.record_event)
+        if settings.QUERY_STATS_ENABLED:
+            connection_created.connect(install_query_stats)
@@ -0,0 +1,210 @@
+"""
+Cold storage for old AttendanceLog rows.
+
+Logs are archived per calendar month under ATTENDANCE_ARCHIVE_ROOT/<YYYY-MM>/:
+logs.gz holds one gzip member of JSON lines per student, and index.json maps
+each university_id to the [offset, length] of its member. A single student's
+month can therefore be read with one seek and one small decompress.
+"""
+import gzip
+import json
+import os
+from datetime import date, datetime, time
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import serializers
+from .models import AttendanceLog, Student
+
+MANIFEST_FILE = 'manifest.json'
+LOGS_FILE = 'logs.gz'
+INDEX_FILE = 'index.json'
+# Member key for logs whose student row no longer exists; university ids
+# never start with '#'.
+ORPHAN_MEMBER_KEY = '#{}'
+
+
+def _archive_root():
+    return settings.ATTENDANCE_ARCHIVE_ROOT
+
+def _month_dir(month):
+    return os.path.join(_archive_root(), month.strftime('%Y-%m'))
+
+def _write_json_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def get_archive_cutoff():
+    """
+    Logs strictly before this date live in the archive, or None if nothing
+    has been archived yet.
+    """
+    try:
+        with open(os.path.join(_archive_root(), MANIFEST_FILE)) as f:
+            return date.fromisoformat(json.load(f)['archived_before'])
+    except FileNotFoundError:
+        return None
+
+def set_archive_cutoff(cutoff):
+    os.makedirs(_archive_root(), exist_ok=True)
+    current = get_archive_cutoff()
+    if current is None or cutoff > current:
+        _write_json_atomic(os.path.join(_archive_root(), MANIFEST_FILE), {"archived_before": cutoff.isoformat()})
+
+def _load_index(month):
+    try:
+        with open(os.path.join(_month_dir(month), INDEX_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def _read_member(month, span):
+    offset, length = span
+    with open(os.path.join(_month_dir(month), LOGS_FILE), 'rb') as f:
+        f.seek(offset)
+        payload = gzip.decompress(f.read(length))
+    return [json.loads(line) for line in payload.splitlines() if line]
+
+def _log_to_record(log_row):
+    log_id, university_id, timestamp, bus_number, status, direction = log_row
+    return {
+        "id": log_id,
+        "student_id": university_id,
+        "timestamp": timestamp.isoformat(),
+        "bus_number": bus_number,
+        "status": status,
+        "direction": direction,
+    }
+
+def archive_month(month, start, end):
+    """
+    Writes every log in [start, end) into month's archive, merging with any
+    records already archived for that month. Records are keyed by log id,
+    so re-running a month whose live rows were not yet deleted archives
+    nothing twice. Logs of students that no longer exist are kept under
+    ORPHAN_MEMBER_KEY. Returns the number of new rows. The caller deletes
+    the live rows once this has returned.
+    """
+    month_dir = _month_dir(month)
+    os.makedirs(month_dir, exist_ok=True)
+    old_index = _load_index(month)
+    old_logs_path = os.path.join(month_dir, LOGS_FILE)
+    new_logs_path = f"{old_logs_path}.tmp"
+
+    # Logs may be stored apart from students, so university ids are mapped
+    # from student ids here instead of through a join.
+    university_ids = dict(Student.objects.values_list('id', 'university_id'))
+    rows = AttendanceLog.objects.filter(timestamp__gte=start, timestamp__lt=end).order_by(
+        'student_id', 'timestamp'
+    ).values_list('id', 'student_id', 'timestamp', 'bus_number', 'status', 'direction')
+
+    new_index = {}
+    archived = 0
+
+    with open(new_logs_path, 'wb') as out:
+        def write_member(university_id, records):
+            records.sort(key=lambda record: record['timestamp'])
+            payload = gzip.compress(''.join(json.dumps(record) + '\n' for record in records).encode())
+            new_index[university_id] = [out.tell(), len(payload)]
+            out.write(payload)
+
+        current_id = None
+        current_records = []
+        current_log_ids = set()
+        for log_id, student_id, *fields in rows.iterator(chunk_size=5000):
+            university_id = university_ids.get(student_id, ORPHAN_MEMBER_KEY.format(student_id))
+            record = _log_to_record((log_id, university_id, *fields))
+            if record['student_id'] != current_id:
+                if current_id is not None:
+                    write_member(current_id, current_records)
+                current_id = record['student_id']
+                current_records = _read_member(month, old_index[current_id]) if current_id in old_index else []
+                current_log_ids = {archived_record['id'] for archived_record in current_records}
+            if log_id in current_log_ids:
+                continue
+            current_records.append(record)
+            current_log_ids.add(log_id)
+            archived += 1
+        if current_id is not None:
+            write_member(current_id, current_records)
+
+        # Students archived earlier but without new rows keep their member as-is.
+        untouched = [university_id for university_id in old_index if university_id not in new_index]
+        if untouched:
+            with open(old_logs_path, 'rb') as old:
+                for university_id in untouched:
+                    offset, length = old_index[university_id]
+                    old.seek(offset)
+                    new_index[university_id] = [out.tell(), length]
+                    out.write(old.read(length))
+
+        out.flush()
+        os.fsync(out.fileno())
+
+    os.replace(new_logs_path, old_logs_path)
+    _write_json_atomic(os.path.join(month_dir, INDEX_FILE), new_index)
+    return archived
+
+def _months_between(from_date, to_date):
+    month = date(from_date.year, from_date.month, 1)
+    while month <= to_date:
+        yield month
+        month = date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+
+def read_archived_logs(from_date, to_date, university_id=None):
+    """
+    Archived logs between from_date and to_date (inclusive, local dates),
+    newest first, shaped like AttendanceLogSerializer output. Without a
+    university_id every student's member in the covered months is read.
+    """
+    cutoff = get_archive_cutoff()
+    if cutoff is None or from_date >= cutoff:
+        return []
+
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(from_date, time.min), tz)
+    end = timezone.make_aware(datetime.combine(min(to_date, cutoff), time.max), tz)
+
+    timestamp_field = serializers.DateTimeField()
+    records = []
+    for month in _months_between(from_date, min(to_date, cutoff)):
+        index = _load_index(month)
+        university_ids = [university_id] if university_id else list(index)
+        for member_id in university_ids:
+            if member_id not in index:
+                continue
+            for record in _read_member(month, index[member_id]):
+                timestamp = datetime.fromisoformat(record['timestamp'])
+                if start <= timestamp <= end:
+                    record['timestamp'] = timestamp_field.to_representation(timestamp)
+                    records.append((timestamp, record))
+
+    records.sort(key=lambda item: item[0], reverse=True)
+    records = [record for _, record in records]
+
+    names = {
+        student.university_id: student.user.get_full_name() if student.user else ''
+        for student in Student.objects.filter(university_id__in={record['student_id'] for record in records}).select_related('user')
+    }
+    return [
+        {
+            "id": record['id'],
+            "student_id": record['student_id'],
+            "student_name": names.get(record['student_id'], ''),
+            "timestamp": record['timestamp'],
+            "bus_number": record['bus_number'],
+            "status": record['status'],
+            "direction": record['direction'],
+        }
+        for record in records
+    ]
+
+def filter_archived_logs(records, params, fields):
+    for field in fields:
+        value = params.get(field)
+        if value:
+            records = [record for record in records if record[field] == value]
+    return records
@@ -0,0 +1,135 @@
+"""
+Microbenchmarks for the scan validation and schedule hot paths.
+
+Each benchmark is a setup function returning the zero-argument callable to
+time and the number of operations one call performs, so fixtures are built
+once and outside the measurement. Results are per-operation times;
+run_benchmarks compares them against a saved JSON baseline.
+"""
+import statistics
+import timeit
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.contrib.auth.models import User
+from .models import AttendanceLog, Schedule, Student
+from .schedule_utils import (
+    compile_schedules,
+    get_all_schedules,
+    get_student_schedule_by_id,
+    is_scheduled_at,
+)
+from .serializers import AttendanceLogSerializer, StudentScheduleSerializer
+from .views import parse_scan_timestamp
+
+SERIALIZER_ROWS = 1000
+
+
+def _students(count):
+    # Unsaved instances: these benchmarks measure Python work, not the database.
+    schedule_ids = sorted(get_all_schedules())
+    return [
+        Student(
+            university_id=str(1000000 + i),
+            registration_code=f"BENCH{i:05d}",
+            schedule_id=schedule_ids[i % len(schedule_ids)],
+            user=User(first_name=f"First{i}", last_name=f"Last{i}"),
+        )
+        for i in range(count)
+    ]
+
+
+def bench_compile_schedules():
+    rows = list(Schedule.objects.values_list('schedule_id', 'course', 'year', 'day_mask', 'time_windows'))
+    return lambda: compile_schedules(rows), len(rows)
+
+def bench_schedule_lookup():
+    schedule_ids = sorted(get_all_schedules())
+    return lambda: [get_student_schedule_by_id(schedule_id) for schedule_id in schedule_ids], len(schedule_ids)
+
+def bench_day_matching():
+    schedule_id = sorted(get_all_schedules())[0]
+    monday = datetime(2026, 1, 5, 8, 30, tzinfo=dt_timezone.utc)
+    week = [monday + timedelta(days=offset) for offset in range(7)]
+    return lambda: [is_scheduled_at(schedule_id, moment) for moment in week], len(week)
+
+def bench_timestamp_parsing():
+    values = ['2026-01-05T08:30:00Z', '2026-01-05T08:30:00.123456+00:00', '2026-01-05T08:30:00+02:00']
+    return lambda: [parse_scan_timestamp(value) for value in values], len(values)
+
+def bench_attendance_log_serializer():
+    students = _students(100)
+    now = datetime(2026, 1, 5, 8, 30, tzinfo=dt_timezone.utc)
+    logs = [
+        AttendanceLog(
+            id=i,
+            student=students[i % len(students)],
+            timestamp=now - timedelta(minutes=i),
+            bus_number=str(i % 25),
+            status=AttendanceLog.ScanStatus.values[i % 3],
+            direction=AttendanceLog.BusDirection.values[i % 2],
+        )
+        for i in range(SERIALIZER_ROWS)
+    ]
+    return lambda: AttendanceLogSerializer(logs, many=True).data, len(logs)
+
+def bench_student_schedule_serializer():
+    students = _students(SERIALIZER_ROWS)
+    return lambda: StudentScheduleSerializer(students, many=True).data, len(students)
+
+
+BENCHMARKS = {
+    'compile_schedules': (bench_compile_schedules, "compile_schedules, per schedule"),
+    'schedule_lookup': (bench_schedule_lookup, "get_student_schedule_by_id, cache hit"),
+    'day_matching': (bench_day_matching, "is_scheduled_at, table cached"),
+    'timestamp_parsing': (bench_timestamp_parsing, "ScanLogView scan_timestamp parsing"),
+    'attendance_log_serializer': (bench_attendance_log_serializer, "AttendanceLogSerializer, per row"),
+    'student_schedule_serializer': (bench_student_schedule_serializer, "StudentScheduleSerializer, per row"),
+}
+
+
+def run_benchmark(name, repeat=10):
+    """
+    Times one benchmark: each of `repeat` rounds runs the callable for about
+    0.2s (timeit's autorange). Returns per-operation times in nanoseconds.
+    """
+    setup, description = BENCHMARKS[name]
+    func, operations = setup()
+
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    rounds = [elapsed / number / operations * 1e9 for elapsed in timer.repeat(repeat=repeat, number=number)]
+
+    return {
+        "description": description,
+        "operations_per_call": operations,
+        "calls_per_round": number,
+        "min_ns": round(min(rounds), 1),
+        "median_ns": round(statistics.median(rounds), 1),
+        "ops_per_second": round(1e9 / statistics.median(rounds)),
+    }
+
+
+def _noise(result):
+    # How far the typical round sits above the best one.
+    return result['median_ns'] / result['min_ns'] - 1
+
+def compare_to_baseline(results, baseline, threshold):
+    """
+    Lists benchmarks whose best round is more than `threshold` (a fraction)
+    slower than the baseline's, widened by the noise either run showed.
+    The best round is compared because interference only ever adds time, so
+    it is the most repeatable figure; the widening keeps a noisy machine
+    from failing on jitter alone. Benchmarks missing from either side are
+    ignored.
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        change = result['min_ns'] / previous['min_ns'] - 1
+        allowed = threshold + max(_noise(result), _noise(previous))
+        result['change_vs_baseline'] = round(change, 4)
+        result['allowed_change'] = round(allowed, 4)
+        if change > allowed:
+            regressions.append((name, previous['min_ns'], result['min_ns'], change, allowed))
+    return regressions
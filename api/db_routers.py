@@ -0,0 +1,235 @@
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from functools import partial
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# Signed cookie naming the user pinned to the primary after a write. A
+# cookie, unlike the process-local cache, reaches whichever worker serves
+# the user's next request.
+PRIMARY_PIN_COOKIE = 'db_primary_pin'
+PRIMARY_PIN_SALT = 'api.db_routers.primary_pin'
+
+
+class RoutingState:
+    """Per-request routing decisions, shared between the views and the router."""
+
+    def __init__(self):
+        self.read_alias = None
+        self.wrote = False
+
+
+_routing_state = ContextVar('db_routing_state', default=None)
+
+
+def get_reporting_alias():
+    alias = getattr(settings, 'REPORTING_DB_ALIAS', None)
+    return alias if alias and alias in settings.DATABASES else None
+
+
+# Append-heavy models that move to ATTENDANCE_DB_ALIAS when it is set.
+ATTENDANCE_MODELS = {'api.attendancelog', 'api.trip'}
+
+
+def get_attendance_alias():
+    alias = getattr(settings, 'ATTENDANCE_DB_ALIAS', None)
+    return alias if alias and alias in settings.DATABASES else None
+
+
+class AttendanceLogRouter:
+    """
+    Keeps AttendanceLog in its own database when ATTENDANCE_DB_ALIAS is set.
+    Code that crosses the boundary works through ids (student_id) rather
+    than joins; following log.student from a log row is routed back to the
+    main database here.
+    """
+
+    def _is_attendance_model(self, model):
+        return model._meta.label_lower in ATTENDANCE_MODELS
+
+    def _from_attendance_db(self, hints, alias):
+        instance = hints.get('instance')
+        return instance is not None and instance._state.db == alias
+
+    def db_for_read(self, model, **hints):
+        alias = get_attendance_alias()
+        if alias is None:
+            return None
+        if self._is_attendance_model(model):
+            return alias
+        if self._from_attendance_db(hints, alias):
+            state = _routing_state.get()
+            return (state and state.read_alias) or DEFAULT_DB_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        alias = get_attendance_alias()
+        if alias is None:
+            return None
+        if self._is_attendance_model(model):
+            return alias
+        if self._from_attendance_db(hints, alias):
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        alias = get_attendance_alias()
+        if alias and alias in (obj1._state.db, obj2._state.db):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        alias = get_attendance_alias()
+        if alias is None:
+            return None
+        is_attendance_model = f'{app_label}.{model_name}' in ATTENDANCE_MODELS
+        if db == alias:
+            return is_attendance_model
+        if is_attendance_model:
+            return False
+        return None
+
+
+class ReportingReplicaRouter:
+    """
+    Sends reads to the reporting replica only for requests that opted in
+    (see route_reads_to_replica); every write, and every read outside such
+    a request, stays on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing_state.get()
+        return state.read_alias if state else None
+
+    def db_for_write(self, model, **hints):
+        # Routing is not writing (code asks for the write alias just to read
+        # from the primary); PrimaryPinningMiddleware watches the SQL instead.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica mirrors the primary, so rows read from either belong together.
+        mirrored = {DEFAULT_DB_ALIAS, get_reporting_alias()}
+        if obj1._state.db in mirrored and obj2._state.db in mirrored:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == get_reporting_alias():
+            return False
+        return None
+
+
+_lag_lock = threading.Lock()
+_lag_checked_at = None
+_replica_fresh = False
+
+# Lag is the age of the last replayed transaction, counted only while the
+# replica still has WAL to replay (an idle primary is not lag).
+POSTGRES_LAG_SQL = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+def replica_is_fresh(alias):
+    """
+    True when the replica is reachable and no further behind than
+    REPLICA_MAX_LAG_SECONDS. The answer is reused for
+    REPLICA_LAG_CHECK_SECONDS so a busy worker checks at most once per
+    interval.
+    """
+    global _lag_checked_at, _replica_fresh
+    with _lag_lock:
+        now = time.monotonic()
+        if _lag_checked_at is not None and now - _lag_checked_at < settings.REPLICA_LAG_CHECK_SECONDS:
+            return _replica_fresh
+
+        connection = connections[alias]
+        try:
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(POSTGRES_LAG_SQL)
+                    lag = float(cursor.fetchone()[0])
+            else:
+                connection.ensure_connection()
+                lag = 0.0
+            _replica_fresh = lag <= settings.REPLICA_MAX_LAG_SECONDS
+            if not _replica_fresh:
+                logger.warning("Replica %s is %.1fs behind; reading from the primary.", alias, lag)
+        except DatabaseError:
+            logger.exception("Replica %s is unavailable; reading from the primary.", alias)
+            _replica_fresh = False
+        _lag_checked_at = now
+        return _replica_fresh
+
+
+def pin_to_primary(response, user):
+    response.set_signed_cookie(
+        PRIMARY_PIN_COOKIE, str(user.pk), salt=PRIMARY_PIN_SALT, max_age=settings.REPLICA_PIN_SECONDS,
+        secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax',
+    )
+
+def is_pinned_to_primary(request, user):
+    # The signature's timestamp enforces the pin's lifetime server-side.
+    pinned_user = request.get_signed_cookie(
+        PRIMARY_PIN_COOKIE, default=None, salt=PRIMARY_PIN_SALT, max_age=settings.REPLICA_PIN_SECONDS,
+    )
+    return pinned_user == str(user.pk)
+
+
+def route_reads_to_replica(request):
+    """
+    Sends the rest of the current request's reads to the reporting replica,
+    unless there is no replica, the user wrote something within the last
+    REPLICA_PIN_SECONDS (so they see their own changes), or the replica is
+    lagging.
+    """
+    state = _routing_state.get()
+    alias = get_reporting_alias()
+    if state is None or alias is None:
+        return False
+    user = request.user
+    if user.is_authenticated and is_pinned_to_primary(request, user):
+        return False
+    if not replica_is_fresh(alias):
+        return False
+    state.read_alias = alias
+    return True
+
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+def _note_writes(state, execute, sql, params, many, context):
+    if not state.wrote and sql.lstrip()[:6].upper() in WRITE_STATEMENTS:
+        state.wrote = True
+    return execute(sql, params, many, context)
+
+
+class PrimaryPinningMiddleware:
+    """
+    Watches the SQL a request runs on the primary and, if any of it wrote,
+    pins the user to the primary for REPLICA_PIN_SECONDS. Must come after
+    AuthenticationMiddleware; JWT-authenticated users are seen because DRF
+    sets request.user on the underlying request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState()
+        token = _routing_state.set(state)
+        try:
+            with connections[DEFAULT_DB_ALIAS].execute_wrapper(partial(_note_writes, state)):
+                response = self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+        user = getattr(request, 'user', None)
+        if state.wrote and user is not None and user.is_authenticated:
+            pin_to_primary(response, user)
+        return response
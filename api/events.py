@@ -0,0 +1,122 @@
+import asyncio
+import threading
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+SUBSCRIPTION_QUEUE_SIZE = 100
+
+
+class ScanSubscription:
+    """
+    One connected listener, bound to the event loop it was created on.
+    Events are handed over with call_soon_threadsafe, so the scan path can
+    publish from any worker thread without blocking on slow consumers.
+    """
+
+    def __init__(self, hub, university_ids, loop):
+        self.hub = hub
+        self.university_ids = set(university_ids)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIPTION_QUEUE_SIZE)
+
+    def push(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The loop has shut down; the subscription is already dead.
+            self.hub.unsubscribe(self)
+
+    def _put(self, event):
+        if self.queue.full():
+            # Drop the oldest event rather than let a stalled client grow memory.
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class ScanEventHub:
+    """
+    In-process publish/subscribe hub for attendance scans. Subscriptions are
+    indexed by university_id so dispatch only touches the listeners of the
+    scanned student. Plain callables can also be registered as listeners to
+    receive every event (e.g. in-memory counters).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+        self._listeners = []
+
+    def subscribe(self, university_ids):
+        subscription = ScanSubscription(self, university_ids, asyncio.get_running_loop())
+        with self._lock:
+            for university_id in subscription.university_ids:
+                self._subscriptions.setdefault(university_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for university_id in subscription.university_ids:
+                subscriptions = self._subscriptions.get(university_id)
+                if subscriptions:
+                    subscriptions.discard(subscription)
+                    if not subscriptions:
+                        del self._subscriptions[university_id]
+
+    def add_listener(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def dispatch(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(event['student_id'], ()))
+            listeners = list(self._listeners)
+
+        for subscription in subscriptions:
+            subscription.push(event)
+        for listener in listeners:
+            listener(event)
+
+
+scan_event_hub = ScanEventHub()
+
+
+class LocalScanEventBackend:
+    """
+    Delivers events straight to this process's hub. A cross-process backend
+    (e.g. Redis pub/sub) would publish here instead and run a subscriber
+    thread that calls scan_event_hub.dispatch() in every worker.
+    """
+
+    def publish(self, event):
+        scan_event_hub.dispatch(event)
+
+
+_backend = None
+
+def get_scan_event_backend():
+    global _backend
+    if _backend is None:
+        backend_path = getattr(settings, 'SCAN_EVENT_BACKEND', 'api.events.LocalScanEventBackend')
+        _backend = import_string(backend_path)()
+    return _backend
+
+def build_scan_event(log):
+    return {
+        "id": log.id,
+        "student_id": log.student.university_id,
+        "timestamp": log.timestamp.isoformat(),
+        "bus_number": log.bus_number,
+        "status": log.status,
+        "direction": log.direction,
+    }
+
+def publish_scan_event(log):
+    event = build_scan_event(log)
+    transaction.on_commit(lambda: get_scan_event_backend().publish(event))
@@ -0,0 +1,68 @@
+import io
+import os
+import pstats
+import statistics
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.profiling import PROFILE_NAME_RE
+
+
+class Command(BaseCommand):
+    help = "Summarises and merges request profiles captured by RequestProfilerMiddleware."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=None, help="Profile directory (defaults to PROFILE_OUTPUT_DIR).")
+        parser.add_argument('--view', help="Only include profiles of this view name.")
+        parser.add_argument('--top', type=int, default=25, help="Functions to list from the merged pstats.")
+        parser.add_argument('--sort', default='cumulative', help="pstats sort key.")
+        parser.add_argument('--folded-out', help="Write the merged folded stacks to this file for flamegraph tools.")
+
+    def handle(self, *args, **options):
+        profile_dir = options['dir'] or settings.PROFILE_OUTPUT_DIR
+        if not os.path.isdir(profile_dir):
+            raise CommandError(f"No profiles found: {profile_dir} does not exist.")
+
+        runs = defaultdict(list)
+        pstats_paths = []
+        folded = Counter()
+        for file_name in sorted(os.listdir(profile_dir)):
+            match = PROFILE_NAME_RE.match(file_name)
+            if not match or (options['view'] and match['view'] != options['view']):
+                continue
+            path = os.path.join(profile_dir, file_name)
+            if match['kind'] == 'pstats':
+                pstats_paths.append(path)
+                runs[match['view']].append((int(match['queries']), int(match['ms'])))
+            elif options['folded_out']:
+                with open(path) as f:
+                    for line in f:
+                        stack, _, count = line.rstrip('\n').rpartition(' ')
+                        if stack:
+                            folded[stack] += int(count)
+
+        if not pstats_paths:
+            raise CommandError("No matching profiles.")
+
+        self.stdout.write(f"{'view':<40} {'profiles':>8} {'median ms':>10} {'max ms':>8} {'median queries':>15} {'max queries':>12}")
+        for view, view_runs in sorted(runs.items(), key=lambda item: -statistics.median(ms for _, ms in item[1])):
+            queries = [count for count, _ in view_runs]
+            durations = [ms for _, ms in view_runs]
+            self.stdout.write(
+                f"{view:<40} {len(view_runs):>8} {statistics.median(durations):>10.0f} {max(durations):>8} "
+                f"{statistics.median(queries):>15.0f} {max(queries):>12}"
+            )
+        self.stdout.write("")
+
+        report = io.StringIO()
+        stats = pstats.Stats(pstats_paths[0], stream=report)
+        for path in pstats_paths[1:]:
+            stats.add(path)
+        stats.sort_stats(options['sort']).print_stats(options['top'])
+        self.stdout.write(report.getvalue())
+
+        if options['folded_out']:
+            with open(options['folded_out'], 'w') as f:
+                for stack, count in folded.most_common():
+                    f.write(f"{stack} {count}\n")
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(folded)} merged stacks to {options['folded_out']}."))
@@ -0,0 +1,55 @@
+from datetime import date, datetime, time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from api.archive import archive_month, set_archive_cutoff
+from api.models import AttendanceLog, Trip
+
+
+class Command(BaseCommand):
+    help = "Moves AttendanceLog rows older than a cutoff date into the compressed monthly archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', required=True, help="Archive logs strictly before this date (YYYY-MM-DD).")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows deleted from the live table per query.")
+
+    def handle(self, *args, **options):
+        try:
+            cutoff = date.fromisoformat(options['before'])
+        except ValueError:
+            raise CommandError("--before must be in YYYY-MM-DD format.")
+
+        tz = timezone.get_current_timezone()
+        cutoff_at = timezone.make_aware(datetime.combine(cutoff, time.min), tz)
+
+        oldest = AttendanceLog.objects.filter(timestamp__lt=cutoff_at).order_by('timestamp').values_list('timestamp', flat=True).first()
+        if oldest is None:
+            set_archive_cutoff(cutoff)
+            self.stdout.write("No logs older than the cutoff.")
+            return
+
+        month = timezone.localtime(oldest, tz).date().replace(day=1)
+        total = 0
+        while month < cutoff:
+            next_month = date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+            start = timezone.make_aware(datetime.combine(month, time.min), tz)
+            end = min(timezone.make_aware(datetime.combine(next_month, time.min), tz), cutoff_at)
+
+            archived = archive_month(month, start, end)
+            deleted = self._delete_in_batches(start, end, options['batch_size'])
+            total += archived
+            self.stdout.write(f"{month:%Y-%m}: archived {archived} logs, deleted {deleted} live rows.")
+            month = next_month
+
+        # Trips are not archived; drop the ones whose scans are gone.
+        Trip.objects.filter(ended_at__lt=cutoff_at).delete()
+        set_archive_cutoff(cutoff)
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} logs older than {cutoff}."))
+
+    def _delete_in_batches(self, start, end, batch_size):
+        deleted = 0
+        live_rows = AttendanceLog.objects.filter(timestamp__gte=start, timestamp__lt=end).order_by()
+        while True:
+            batch_ids = list(live_rows.values_list('id', flat=True)[:batch_size])
+            if not batch_ids:
+                return deleted
+            deleted += AttendanceLog.objects.filter(id__in=batch_ids).delete()[0]
@@ -0,0 +1,75 @@
+import io
+import json
+import time
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from api.models import AttendanceLog, Student
+from api.renderers import FastJSONParser, FastJSONRenderer
+from api.serializers import AttendanceLogSerializer
+
+
+def _build_payload(rows):
+    # Unsaved instances: the benchmark needs serializer output, not a database.
+    users = [User(first_name=f"First{i}", last_name=f"Last{i}") for i in range(100)]
+    students = [Student(university_id=str(1000000 + i), registration_code=f"BENCH{i:05d}", user=users[i]) for i in range(100)]
+    now = timezone.now()
+    logs = [
+        AttendanceLog(
+            id=i,
+            student=students[i % 100],
+            timestamp=now - timedelta(minutes=i),
+            bus_number=str(i % 25),
+            status=AttendanceLog.ScanStatus.values[i % 3],
+            direction=AttendanceLog.BusDirection.values[i % 2],
+        )
+        for i in range(rows)
+    ]
+    return AttendanceLogSerializer(logs, many=True).data
+
+
+class Command(BaseCommand):
+    help = "Compares DRF's JSON renderer/parser with the orjson-backed ones on AttendanceLogSerializer payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def _time(self, func, repeat):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
+
+    def handle(self, *args, **options):
+        results = []
+        for rows in options['rows']:
+            payload = _build_payload(rows)
+
+            baseline = JSONRenderer().render(payload)
+            fast = FastJSONRenderer().render(payload)
+            if baseline != fast:
+                self.stderr.write(self.style.ERROR(f"{rows} rows: rendered output differs from JSONRenderer."))
+
+            parser_context = {'encoding': 'utf-8'}
+            result = {
+                "rows": rows,
+                "bytes": len(baseline),
+                "identical_output": baseline == fast,
+                "render_ms": {
+                    "drf": round(self._time(lambda: JSONRenderer().render(payload), options['repeat']), 3),
+                    "fast": round(self._time(lambda: FastJSONRenderer().render(payload), options['repeat']), 3),
+                },
+                "parse_ms": {
+                    "drf": round(self._time(lambda: JSONParser().parse(io.BytesIO(baseline), parser_context=parser_context), options['repeat']), 3),
+                    "fast": round(self._time(lambda: FastJSONParser().parse(io.BytesIO(baseline), parser_context=parser_context), options['repeat']), 3),
+                },
+            }
+            results.append(result)
+
+        self.stdout.write(json.dumps(results, indent=2))
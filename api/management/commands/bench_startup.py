@@ -0,0 +1,60 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter and does what a worker does at boot: set up
+# Django and load the URLconf (and with it every view module).
+WORKER_BOOT_SCRIPT = """
+import json, resource, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+elapsed = time.perf_counter() - start
+heavy = [name for name in ('pandas', 'numpy') if name in sys.modules]
+print(json.dumps({
+    "import_ms": elapsed * 1000,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy_modules": heavy,
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = "Measures worker start-up import time and resident memory in fresh interpreters."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--max-import-ms', type=float, help="Fail if the median import time exceeds this.")
+        parser.add_argument('--max-rss-mb', type=float, help="Fail if the median resident memory exceeds this.")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'myproject.settings'))
+        runs = []
+        for _ in range(options['repeat']):
+            output = subprocess.run(
+                [sys.executable, '-c', WORKER_BOOT_SCRIPT],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True
+            ).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+
+        result = {
+            "runs": len(runs),
+            "median_import_ms": round(statistics.median(run['import_ms'] for run in runs), 1),
+            "median_max_rss_mb": round(statistics.median(run['max_rss_mb'] for run in runs), 1),
+            "heavy_modules": runs[-1]['heavy_modules'],
+        }
+        self.stdout.write(json.dumps(result, indent=2))
+
+        failures = []
+        if options['max_import_ms'] is not None and result['median_import_ms'] > options['max_import_ms']:
+            failures.append(f"import time {result['median_import_ms']}ms > {options['max_import_ms']}ms")
+        if options['max_rss_mb'] is not None and result['median_max_rss_mb'] > options['max_rss_mb']:
+            failures.append(f"resident memory {result['median_max_rss_mb']}MB > {options['max_rss_mb']}MB")
+        if failures:
+            raise SystemExit("Start-up regression: " + "; ".join(failures))
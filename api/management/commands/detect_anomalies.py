@@ -0,0 +1,66 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+from api.anomalies import AnomalyThresholds, detect_anomalies_for_days, init_worker
+from api.models import AttendanceAnomaly
+
+
+class Command(BaseCommand):
+    help = "Scans AttendanceLog history for repeated invalid scans, card sharing and unusual override rates."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from-date', help="First day to scan (YYYY-MM-DD). Defaults to yesterday.")
+        parser.add_argument('--to-date', help="Last day to scan (YYYY-MM-DD). Defaults to yesterday.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--days-per-task', type=int, default=7)
+        parser.add_argument('--invalid-threshold', type=int, default=AnomalyThresholds.invalid_scans)
+        parser.add_argument('--sharing-window-minutes', type=int, default=AnomalyThresholds.sharing_window_minutes)
+        parser.add_argument('--override-factor', type=float, default=AnomalyThresholds.override_rate_factor)
+        parser.add_argument('--min-overrides', type=int, default=AnomalyThresholds.min_overrides)
+
+    def handle(self, *args, **options):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        try:
+            from_date = date.fromisoformat(options['from_date']) if options['from_date'] else yesterday
+            to_date = date.fromisoformat(options['to_date']) if options['to_date'] else yesterday
+        except ValueError:
+            raise CommandError("Dates must be in YYYY-MM-DD format.")
+
+        if from_date > to_date:
+            raise CommandError("--from-date must not be after --to-date.")
+
+        thresholds = AnomalyThresholds(
+            invalid_scans=options['invalid_threshold'],
+            sharing_window_minutes=options['sharing_window_minutes'],
+            override_rate_factor=options['override_factor'],
+            min_overrides=options['min_overrides'],
+        )
+
+        days = [from_date + timedelta(days=offset) for offset in range((to_date - from_date).days + 1)]
+        step = max(1, options['days_per_task'])
+        tasks = [days[i:i + step] for i in range(0, len(days), step)]
+
+        findings = []
+        if options['workers'] <= 1 or len(tasks) == 1:
+            for task_days in tasks:
+                findings.extend(detect_anomalies_for_days(task_days, thresholds))
+        else:
+            # Forked workers must not inherit the parent's open DB connections.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker) as pool:
+                for task_findings in pool.map(detect_anomalies_for_days, tasks, [thresholds] * len(tasks)):
+                    findings.extend(task_findings)
+
+        with transaction.atomic():
+            AttendanceAnomaly.objects.filter(date__gte=from_date, date__lte=to_date).delete()
+            AttendanceAnomaly.objects.bulk_create(
+                [AttendanceAnomaly(**finding) for finding in findings],
+                batch_size=1000
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {len(days)} day(s) from {from_date} to {to_date}: {len(findings)} anomalies recorded."
+        ))
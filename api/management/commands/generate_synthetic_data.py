@@ -0,0 +1,102 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from datetime import date, timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router
+from django.utils import timezone
+from api.models import AttendanceLog, Student
+from api.roster import record_roster_change
+from api.schedule_utils import get_schedule_day_masks
+from api.search import invalidate_search_index
+from api.synthetic import (
+    SCALE_PROFILES,
+    generate_log_chunk,
+    generate_passes_and_requests,
+    generate_people,
+    init_worker,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills the database with reproducible synthetic students, parents, passes, requests and "
+        "attendance logs for scale testing. Use --profile ci in CI and --profile large for benchmarks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', choices=sorted(SCALE_PROFILES), default='ci')
+        parser.add_argument('--students', type=int, help="Override the profile's student count.")
+        parser.add_argument('--parents', type=int, help="Override the profile's parent count.")
+        parser.add_argument('--days', type=int, help="Override the profile's days of scan history.")
+        parser.add_argument('--end-date', help="Last day of scan history (YYYY-MM-DD). Defaults to yesterday.")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--prefix', default='SYN', help="University id prefix; use a new one to add a second data set.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--students-per-chunk', type=int, default=1000)
+        parser.add_argument('--skip-logs', action='store_true')
+
+    def handle(self, *args, **options):
+        scale = SCALE_PROFILES[options['profile']]
+        overrides = {field: options[field] for field in ('students', 'parents', 'days') if options[field] is not None}
+        scale = replace(scale, **overrides)
+
+        try:
+            end_date = date.fromisoformat(options['end_date']) if options['end_date'] else timezone.localdate() - timedelta(days=1)
+        except ValueError:
+            raise CommandError("--end-date must be in YYYY-MM-DD format.")
+        start_date = end_date - timedelta(days=scale.days - 1)
+
+        prefix = options['prefix']
+        if Student.objects.filter(university_id__startswith=prefix).exists():
+            raise CommandError(f"Students with the prefix {prefix!r} already exist; pass a different --prefix.")
+
+        day_masks = get_schedule_day_masks()
+        if not day_masks:
+            raise CommandError("No schedules found to assign students to.")
+
+        started = time.perf_counter()
+        student_rows = generate_people(scale, options['seed'], prefix, day_masks)
+        self.stdout.write(f"Created {len(student_rows)} students and {scale.parents} parents.")
+
+        admin = User.objects.filter(is_staff=True).order_by('id').first()
+        pass_count, request_count = generate_passes_and_requests(scale, options['seed'], student_rows, start_date, admin)
+        self.stdout.write(f"Created {pass_count} passes and {request_count} pass requests.")
+
+        # Bulk inserts skip the signals that keep these in step.
+        record_roster_change(*(Student.objects.filter(university_id__startswith=prefix).values_list('university_id', flat=True)))
+        invalidate_search_index()
+
+        if not options['skip_logs']:
+            log_count = self._generate_logs(scale, options, student_rows, start_date, day_masks)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"Created {log_count} attendance logs from {start_date} to {end_date} ({log_count / elapsed:,.0f} rows/s overall).")
+
+        self.stdout.write(self.style.SUCCESS(f"Done in {time.perf_counter() - started:.1f}s (seed {options['seed']})."))
+
+    def _generate_logs(self, scale, options, student_rows, start_date, day_masks):
+        step = max(1, options['students_per_chunk'])
+        chunks = [student_rows[i:i + step] for i in range(0, len(student_rows), step)]
+        args = [(scale, options['seed'], index, chunk, start_date, day_masks) for index, chunk in enumerate(chunks)]
+
+        workers = options['workers']
+        if connections[router.db_for_write(AttendanceLog)].vendor == 'sqlite':
+            # SQLite allows a single writer at a time.
+            workers = 1
+
+        total = 0
+        if workers <= 1 or len(chunks) == 1:
+            for chunk_args in args:
+                total += generate_log_chunk(*chunk_args)
+                self.stdout.write(f"  chunk {chunk_args[2] + 1}/{len(chunks)}: {total} logs")
+            return total
+
+        # Forked workers must not inherit the parent's open DB connections.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+            for done, count in enumerate(pool.map(generate_log_chunk, *zip(*args)), start=1):
+                total += count
+                self.stdout.write(f"  chunk {done}/{len(chunks)}: {total} logs")
+        return total
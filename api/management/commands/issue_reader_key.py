@@ -0,0 +1,41 @@
+import secrets
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api.models import BusReader
+
+
+class Command(BaseCommand):
+    help = "Registers a bus reader, or rotates its API key, and prints the new key once."
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', help="Unique reader name.")
+        parser.add_argument('--bus-number', help="Bus this reader is mounted on.")
+        parser.add_argument('--disable', action='store_true', help="Disable the reader instead of issuing a key.")
+
+    def handle(self, *args, **options):
+        reader = BusReader.objects.filter(name=options['name']).first()
+
+        if options['disable']:
+            if not reader:
+                self.stderr.write(f"No reader named {options['name']}.")
+                return
+            reader.is_enabled = False
+            reader.save()
+            self.stdout.write(self.style.SUCCESS(f"Disabled reader {reader.name}."))
+            return
+
+        created = reader is None
+        if created:
+            reader = BusReader(name=options['name'])
+
+        raw_key = secrets.token_urlsafe(32)
+        reader.set_key(raw_key)
+        reader.is_enabled = True
+        reader.key_rotated_at = timezone.now()
+        if options['bus_number'] is not None:
+            reader.bus_number = options['bus_number']
+        reader.save()
+
+        action = "Registered" if created else "Rotated key for"
+        self.stdout.write(self.style.SUCCESS(f"{action} reader {reader.name} (bus {reader.bus_number or '-'})."))
+        self.stdout.write(f"API key (shown once): {raw_key}")
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.schedule_utils import SCHEDULE_FILE_PATH, load_schedules_from_csv
+
+
+class Command(BaseCommand):
+    help = "Creates or updates schedules from a CSV (schedule_id, course, year, days, optional time_windows)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=SCHEDULE_FILE_PATH, help="CSV to load (defaults to schedules.csv).")
+        parser.add_argument('--prune', action='store_true', help="Delete schedules that are not in the file.")
+
+    def handle(self, *args, **options):
+        try:
+            created, updated, deleted = load_schedules_from_csv(options['path'], prune=options['prune'])
+        except (OSError, KeyError, ValueError) as e:
+            raise CommandError(f"Could not load {options['path']}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"Schedules: {created} created, {updated} updated, {deleted} deleted."))
@@ -0,0 +1,19 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api.roster import prune_roster_changes
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes roster changes older than --days. Readers that last synced before them are "
+        "told to fetch a full snapshot. Run daily, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ROSTER_CHANGE_RETENTION_DAYS, help="Keep changes from this many days.")
+
+    def handle(self, *args, **options):
+        deleted = prune_roster_changes(timezone.now() - timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} roster changes older than {options['days']} days."))
@@ -0,0 +1,49 @@
+from datetime import date, datetime, time, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from api.trips import clear_trips, rebuild_trip_chunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the trip table from the scan history, one time chunk at a time. "
+        "Scans recorded while it runs are segmented by the scan endpoint as usual; "
+        "run it when readers are quiet to avoid splitting their trips."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Only rebuild trips from this date (YYYY-MM-DD); defaults to all history.")
+        parser.add_argument('--chunk-days', type=int, default=1, help="Days of logs segmented per transaction.")
+
+    def handle(self, *args, **options):
+        tz = timezone.get_current_timezone()
+        since = None
+        if options['since']:
+            try:
+                since = timezone.make_aware(datetime.combine(date.fromisoformat(options['since']), time.min), tz)
+            except ValueError:
+                raise CommandError("--since must be in YYYY-MM-DD format.")
+        if options['chunk_days'] < 1:
+            raise CommandError("--chunk-days must be at least 1.")
+
+        start = clear_trips(since)
+        if start is None:
+            self.stdout.write("No logs to segment.")
+            return
+
+        chunk = timedelta(days=options['chunk_days'])
+        chunk_start = timezone.make_aware(datetime.combine(timezone.localtime(start, tz).date(), time.min), tz)
+        # Cover scans stamped slightly in the future by reader clock skew.
+        stop = timezone.now() + timedelta(days=1)
+        open_trips = {}
+        total_trips = total_scans = 0
+        while chunk_start < stop:
+            chunk_end = chunk_start + chunk
+            trips, scans = rebuild_trip_chunk(max(chunk_start, start), chunk_end, open_trips)
+            if scans:
+                self.stdout.write(f"{timezone.localtime(chunk_start, tz):%Y-%m-%d}: {scans} scans in {trips} new trips.")
+            total_trips += trips
+            total_scans += scans
+            chunk_start = chunk_end
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total_trips} trips from {total_scans} scans."))
@@ -0,0 +1,84 @@
+import json
+import platform
+import subprocess
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from api.benchmarks import BENCHMARKS, compare_to_baseline, run_benchmark
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the scan-path microbenchmarks and writes the results as JSON. With --baseline, "
+        "fails when any benchmark's best round is slower than the baseline's by more than "
+        "--threshold plus the round-to-round noise of either run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help="Run only these benchmarks.")
+        parser.add_argument('--repeat', type=int, default=10, help="Timing rounds per benchmark.")
+        parser.add_argument('--output', help="Write the results JSON to this file (e.g. to save a new baseline).")
+        parser.add_argument('--baseline', help="Results JSON from an earlier run to compare against.")
+        parser.add_argument('--threshold', type=float, default=0.15, help="Allowed slowdown as a fraction (0.15 = 15%%).")
+        parser.add_argument(
+            '--retries', type=int, default=2,
+            help="Times to re-run a benchmark that looks regressed before reporting it, keeping its best result.",
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Could not read baseline: {e}")
+
+        results = {}
+        for name in options['only'] or BENCHMARKS:
+            results[name] = run_benchmark(name, repeat=options['repeat'])
+            if options['output']:
+                self.stdout.write(f"{name:<30} {results[name]['min_ns']:>14,.0f} ns/op  {results[name]['ops_per_second']:>12,} ops/s")
+
+        regressions = []
+        if baseline is not None:
+            regressions = compare_to_baseline(results, baseline['benchmarks'], options['threshold'])
+            # A slow spell on a shared machine can outlast every round of one run.
+            for _ in range(options['retries']):
+                if not regressions:
+                    break
+                for name, *_ in regressions:
+                    rerun = run_benchmark(name, repeat=options['repeat'])
+                    if rerun['min_ns'] < results[name]['min_ns']:
+                        results[name] = rerun
+                regressions = compare_to_baseline(results, baseline['benchmarks'], options['threshold'])
+
+        report = {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "created_at": timezone.now().isoformat(),
+            "baseline_commit": baseline.get('commit') if baseline else None,
+            "benchmarks": results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
+
+        if regressions:
+            for name, previous_ns, current_ns, change, allowed in regressions:
+                self.stderr.write(self.style.ERROR(
+                    f"{name}: {previous_ns:,.0f} -> {current_ns:,.0f} ns/op (+{change:.0%}, allowed +{allowed:.0%})"
+                ))
+            raise CommandError(f"{len(regressions)} benchmark(s) regressed by more than {options['threshold']:.0%} plus noise.")
@@ -0,0 +1,45 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+from api.db_routers import ATTENDANCE_MODELS, get_attendance_alias
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates the attendance log tables in ATTENDANCE_DB_ALIAS and marks the existing "
+        "migrations as applied there. Early migrations create a foreign key to the student "
+        "table, which does not exist in that database, so they cannot be replayed on it. "
+        "Later migrations are applied with: migrate --database <alias>."
+    )
+
+    def handle(self, *args, **options):
+        alias = get_attendance_alias()
+        if alias is None:
+            raise CommandError("ATTENDANCE_DB_ALIAS is not configured.")
+
+        connection = connections[alias]
+        existing_tables = set(connection.introspection.table_names())
+        models = [apps.get_model(label) for label in sorted(ATTENDANCE_MODELS)]
+
+        with connection.schema_editor() as schema_editor:
+            for model in models:
+                if model._meta.db_table in existing_tables:
+                    self.stdout.write(f"{model._meta.db_table} already exists.")
+                    continue
+                schema_editor.create_model(model)
+                self.stdout.write(f"Created {model._meta.db_table}.")
+
+        recorder = MigrationRecorder(connection)
+        applied = recorder.applied_migrations()
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        recorded = 0
+        for key in loader.graph.leaf_nodes():
+            for app_label, name in loader.graph.forwards_plan(key):
+                if (app_label, name) not in applied:
+                    recorder.record_applied(app_label, name)
+                    applied[(app_label, name)] = True
+                    recorded += 1
+
+        self.stdout.write(self.style.SUCCESS(f"{alias} is ready; recorded {recorded} migrations as applied."))
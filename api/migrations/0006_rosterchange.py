@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_buspassrequest_approved_valid_from_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RosterChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('university_id', models.CharField(db_index=True, max_length=255)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_rosterchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceAnomaly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('REPEATED_INVALID', 'Repeated Invalid Scans'), ('CARD_SHARING', 'Card Used on Two Buses'), ('OVERRIDE_RATE', 'Unusual Override Rate')], db_index=True, max_length=20)),
+                ('bus_number', models.CharField(blank=True, max_length=50, null=True)),
+                ('date', models.DateField(db_index=True)),
+                ('details', models.JSONField(blank=True, default=dict)),
+                ('detected_at', models.DateTimeField(auto_now_add=True)),
+                ('student', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='anomalies', to='api.student')),
+            ],
+            options={
+                'ordering': ['-date', 'kind'],
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:14
+
+import unicodedata
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.conf import settings
+from django.db import migrations, models
+
+
+def normalize_search_text(*parts):
+    # Frozen copy of api.search.normalize_search_text as of this migration.
+    text = ' '.join(str(part) for part in parts if part)
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.lower().split())
+
+def backfill_search_text(apps, schema_editor):
+    Student = apps.get_model('api', 'Student')
+    Parent = apps.get_model('api', 'Parent')
+
+    students = list(Student.objects.select_related('user'))
+    for student in students:
+        user = student.user
+        student.search_text = normalize_search_text(
+            student.university_id,
+            user.first_name if user else None,
+            user.last_name if user else None,
+            student.university_email,
+        )
+    Student.objects.bulk_update(students, ['search_text'], batch_size=1000)
+
+    parents = list(Parent.objects.select_related('user'))
+    for parent in parents:
+        user = parent.user
+        parent.search_text = normalize_search_text(user.first_name, user.last_name, user.email, parent.phone_number)
+    Parent.objects.bulk_update(parents, ['search_text'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_attendanceanomaly'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='parent',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(backfill_search_text, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='parent',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_text'], name='parent_search_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_text'], name='student_search_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:18
+
+from django.conf import settings
+from django.db import migrations
+
+
+# The index is Postgres-only (a GiST index over a tstzrange expression), so it
+# is created here rather than declared on the model; other backends skip it
+# and filter_passes_covering falls back to a plain predicate there.
+def create_pass_window_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # btree_gist lets the plain student column share the GiST index.
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute(
+        'CREATE INDEX unused_pass_window_gist ON api_studentbuspass USING gist '
+        "(student_id, TSTZRANGE(valid_from, valid_until, '[]')) WHERE used_at IS NULL"
+    )
+
+def drop_pass_window_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS unused_pass_window_gist')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_search_text'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_pass_window_index, drop_pass_window_index),
+    ]
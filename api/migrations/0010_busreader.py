@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_pass_window_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusReader',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('bus_number', models.CharField(blank=True, max_length=50, null=True)),
+                ('key_prefix', models.CharField(max_length=8, unique=True)),
+                ('key_hash', models.CharField(max_length=64)),
+                ('is_enabled', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('key_rotated_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+    ]
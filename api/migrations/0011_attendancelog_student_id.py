@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_busreader'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attendancelog',
+            name='student',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='attendance_logs', to='api.student'),
+        ),
+    ]
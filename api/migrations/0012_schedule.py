@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:39
+
+import csv
+import os
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copy of the CSV parsing in api.schedule_utils as of this
+# migration, so later changes there do not change what it imports.
+WEEKDAY_CODES = ['Mo', 'Tu', 'We', 'Th', 'Fr', 'Sa', 'Su']
+
+
+def _day_mask(days):
+    mask = 0
+    for day in days.split('|'):
+        code = day.strip()[:2].title()
+        if code in WEEKDAY_CODES:
+            mask |= 1 << WEEKDAY_CODES.index(code)
+    return mask
+
+
+def import_schedules_csv(apps, schema_editor):
+    path = os.path.join(settings.BASE_DIR, 'schedules.csv')
+    if not os.path.exists(path):
+        return
+    Schedule = apps.get_model('api', 'Schedule')
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    Schedule.objects.bulk_create([
+        Schedule(
+            schedule_id=row['schedule_id'],
+            course=row['course'],
+            year=row['year'] or '',
+            day_mask=_day_mask(row['days'] or ''),
+            time_windows=[window.strip() for window in (row.get('time_windows') or '').split('|') if window.strip()],
+        )
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_attendancelog_student_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Schedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('schedule_id', models.CharField(max_length=50, unique=True)),
+                ('course', models.CharField(max_length=255)),
+                ('year', models.CharField(blank=True, max_length=20)),
+                ('day_mask', models.PositiveSmallIntegerField(default=0)),
+                ('time_windows', models.JSONField(blank=True, default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['schedule_id'],
+            },
+        ),
+        migrations.RunPython(import_schedules_csv, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Trip',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bus_number', models.CharField(max_length=50)),
+                ('direction', models.CharField(choices=[('INBOUND', 'Inbound to the University'), ('OUTBOUND', 'Outbound to dropoff')], max_length=10)),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField(db_index=True)),
+                ('scan_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['bus_number', 'direction', 'started_at'], name='trip_bus_direction_start')],
+            },
+        ),
+        migrations.AddField(
+            model_name='attendancelog',
+            name='trip',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='logs', to='api.trip'),
+        ),
+    ]
@@ -1,7 +1,24 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.contrib.postgres.fields import DateTimeRangeField
+from django.contrib.postgres.indexes import GinIndex
+import hashlib
 import uuid
 
+class TsTzRange(models.Func):
+    function = 'TSTZRANGE'
+    output_field = DateTimeRangeField()
+
+
+def pass_window():
+    """
+    A pass's [valid_from, valid_until] as a Postgres range. Queries must
+    annotate with this exact expression to use the GiST index on it (see
+    migration 0009).
+    """
+    return TsTzRange(models.F('valid_from'), models.F('valid_until'), models.Value('[]'))
+
 def generate_code():
     while True:
         code = str(uuid.uuid4().hex)[:10].upper()
@@ -34,6 +51,9 @@ class Student(models.Model):
     
     schedule_id = models.CharField(max_length=50, blank=True, null=True, db_index=True)
 
+    # Normalized id/name/email text kept current by api.signals for admin search.
+    search_text = models.TextField(blank=True, default='', editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -41,6 +61,11 @@ class Student(models.Model):
         if self.user:
             return f"{self.user.first_name} {self.user.last_name} ({self.university_id})"
         return f"Student Profile ({self.university_id}) - Unclaimed"
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_text'], name='student_search_trgm', opclasses=['gin_trgm_ops']),
+        ]
          
 
 class Parent(models.Model):
@@ -55,11 +80,17 @@ class Parent(models.Model):
         related_name="parents",
         blank=True
     )
+    search_text = models.TextField(blank=True, default='', editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f'{self.first_name} {self.last_name}'
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_text'], name='parent_search_trgm', opclasses=['gin_trgm_ops']),
+        ]
     
 
 class AttendanceLog(models.Model):
@@ -73,8 +104,11 @@ class AttendanceLog(models.Model):
         INBOUND = 'INBOUND', 'Inbound to the University'
         OUTBOUND = 'OUTBOUND', 'Outbound to dropoff'
 
+    # Logs can live in their own database (see ATTENDANCE_DB_ALIAS), so the
+    # student link is a bare id column: no constraint, no join, no cascade.
+    # A student's logs are deleted by a signal instead.
     student = models.ForeignKey(
-        Student, on_delete=models.CASCADE, related_name="attendance_logs", db_index=True
+        Student, on_delete=models.DO_NOTHING, db_constraint=False, related_name="attendance_logs", db_index=True
     )
     timestamp = models.DateTimeField(db_index=True)
     direction = models.CharField(
@@ -86,12 +120,38 @@ class AttendanceLog(models.Model):
     status = models.CharField(
         max_length=10, choices=ScanStatus.choices, db_index=True
     )
+    # Filled in as scans arrive (see api/trips.py); null for scans without a bus.
+    trip = models.ForeignKey(
+        'Trip', on_delete=models.SET_NULL, null=True, blank=True, related_name="logs"
+    )
     
     def __str__(self):
         return f"[{self.status}] {self.student.university_id} at {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
     
     class Meta:
         ordering = ['-timestamp']
+
+
+class Trip(models.Model):
+    """
+    One run of a bus in one direction: consecutive scans on the same bus and
+    direction no more than TRIP_GAP_MINUTES apart. Stored alongside
+    AttendanceLog.
+    """
+    bus_number = models.CharField(max_length=50)
+    direction = models.CharField(max_length=10, choices=AttendanceLog.BusDirection.choices)
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField(db_index=True)
+    scan_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Bus {self.bus_number} {self.direction} {self.started_at.strftime('%Y-%m-%d %H:%M')} ({self.scan_count} scans)"
+
+    class Meta:
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['bus_number', 'direction', 'started_at'], name='trip_bus_direction_start'),
+        ]
     
 
 class StudentBusPass(models.Model):
@@ -114,6 +174,8 @@ class StudentBusPass(models.Model):
     
     class Meta:
         ordering = ['-valid_from']
+        # Postgres also has a partial GiST index on (student, pass_window())
+        # for unused passes, created by migration 0009 only on that backend.
     
 
 class BusPassRequest(models.Model):
@@ -139,4 +201,138 @@ class BusPassRequest(models.Model):
         return f"Request from {self.student.university_id}: {self.status}"
     
     class Meta:
-        ordering = ['-request_date']
\ No newline at end of file
+        ordering = ['-request_date']
+
+class RosterChange(models.Model):
+    """
+    Append-only log of students whose offline validation data changed.
+    The auto-incrementing id doubles as the roster version readers sync
+    from (see api.roster.get_roster_version). Rows older than
+    ROSTER_CHANGE_RETENTION_DAYS are deleted by prune_roster_changes.
+    """
+    university_id = models.CharField(max_length=255, db_index=True)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Roster change #{self.id} ({self.university_id})"
+
+    class Meta:
+        ordering = ['id']
+
+
+class AttendanceAnomaly(models.Model):
+    class AnomalyKind(models.TextChoices):
+        REPEATED_INVALID = 'REPEATED_INVALID', 'Repeated Invalid Scans'
+        CARD_SHARING = 'CARD_SHARING', 'Card Used on Two Buses'
+        OVERRIDE_RATE = 'OVERRIDE_RATE', 'Unusual Override Rate'
+
+    kind = models.CharField(max_length=20, choices=AnomalyKind.choices, db_index=True)
+    student = models.ForeignKey(
+        Student, on_delete=models.CASCADE, related_name="anomalies", null=True, blank=True
+    )
+    bus_number = models.CharField(max_length=50, blank=True, null=True)
+    date = models.DateField(db_index=True)
+    details = models.JSONField(default=dict, blank=True)
+    detected_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        subject = self.student.university_id if self.student else f"bus {self.bus_number}"
+        return f"[{self.kind}] {subject} on {self.date}"
+
+    class Meta:
+        ordering = ['-date', 'kind']
+
+
+class BusReader(models.Model):
+    """
+    A registered bus scanner. Only a SHA-256 hash of its API key is stored;
+    key_prefix (the first characters of the key) finds the row to compare.
+    """
+    KEY_PREFIX_LENGTH = 8
+
+    name = models.CharField(max_length=100, unique=True)
+    bus_number = models.CharField(max_length=50, blank=True, null=True)
+    key_prefix = models.CharField(max_length=KEY_PREFIX_LENGTH, unique=True)
+    key_hash = models.CharField(max_length=64)
+    is_enabled = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    key_rotated_at = models.DateTimeField(auto_now_add=True)
+
+    @staticmethod
+    def hash_key(raw_key):
+        return hashlib.sha256(raw_key.encode()).hexdigest()
+
+    def set_key(self, raw_key):
+        self.key_prefix = raw_key[:self.KEY_PREFIX_LENGTH]
+        self.key_hash = self.hash_key(raw_key)
+
+    def __str__(self):
+        status = "Enabled" if self.is_enabled else "Disabled"
+        return f"Reader {self.name} (Bus {self.bus_number or '-'}, {status})"
+
+    class Meta:
+        ordering = ['name']
+
+
+
+class SharedVersion(models.Model):
+    """
+    A named counter in the database that per-process caches poll to learn
+    that another process (a worker or a management command) changed their
+    data. See api/versions.py.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class SearchIndexChange(models.Model):
+    """
+    Append-only log of students and parents whose typeahead entry changed,
+    so each worker's in-memory search index can apply the changes instead
+    of rebuilding. kind '*' asks every worker to rebuild. Rows older than
+    SEARCH_INDEX_CHANGE_RETENTION_SECONDS are pruned as new ones are written.
+    See api/search.py.
+    """
+    kind = models.CharField(max_length=10)
+    object_id = models.PositiveBigIntegerField(null=True, blank=True)
+    changed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Search change #{self.id} ({self.kind} {self.object_id})"
+
+
+class Schedule(models.Model):
+    """
+    A timetable students are assigned to through Student.schedule_id.
+    Compiled per worker into api.schedule_utils' lookup table; saving or
+    deleting a schedule bumps the table version so every worker reloads.
+    """
+    schedule_id = models.CharField(max_length=50, unique=True)
+    course = models.CharField(max_length=255)
+    year = models.CharField(max_length=20, blank=True)
+    # Bit 0 = Monday ... bit 6 = Sunday, as in datetime.weekday().
+    day_mask = models.PositiveSmallIntegerField(default=0)
+    # Optional "HH:MM-HH:MM" local-time windows scans must fall in; empty
+    # means any time of a scheduled day.
+    time_windows = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def clean(self):
+        from .schedule_utils import parse_time_window  # schedule_utils imports this module
+
+        if not 0 <= self.day_mask < 1 << 7:
+            raise ValidationError({"day_mask": "day_mask must be a 7-bit weekday mask."})
+        try:
+            for window in self.time_windows:
+                parse_time_window(window)
+        except (TypeError, ValueError) as e:
+            raise ValidationError({"time_windows": str(e)})
+
+    def __str__(self):
+        return f"Schedule {self.schedule_id}: {self.course} (year {self.year})"
+
+    class Meta:
+        ordering = ['schedule_id']
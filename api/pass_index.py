@@ -0,0 +1,166 @@
+import threading
+import time
+from bisect import bisect_right
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from .models import RosterChange, StudentBusPass, pass_window
+from .roster import get_oldest_delta_version, get_roster_version
+
+
+def filter_passes_covering(queryset, at):
+    """
+    Narrows a StudentBusPass queryset to passes whose window contains `at`.
+    On Postgres this is a range containment served by the GiST index on
+    pass_window(); other backends fall back to the two-column predicate.
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        return queryset.annotate(window=pass_window()).filter(window__contains=at)
+    return queryset.filter(valid_from__lte=at, valid_until__gte=at)
+
+
+class IntervalTree:
+    """
+    Static centered interval tree over closed (start, end, value) intervals.
+    A stabbing query returns every interval containing a point in
+    O(log n + k).
+    """
+
+    def __init__(self, intervals):
+        self.center = None
+        self.left = None
+        self.right = None
+        if not intervals:
+            return
+
+        endpoints = sorted(point for interval in intervals for point in interval[:2])
+        self.center = endpoints[len(endpoints) // 2]
+
+        left, right, overlapping = [], [], []
+        for interval in intervals:
+            if interval[1] < self.center:
+                left.append(interval)
+            elif interval[0] > self.center:
+                right.append(interval)
+            else:
+                overlapping.append(interval)
+
+        self.by_start = sorted(overlapping, key=lambda interval: interval[0])
+        self.starts = [interval[0] for interval in self.by_start]
+        self.by_end = sorted(overlapping, key=lambda interval: -interval[1])
+        self.negated_ends = [-interval[1] for interval in self.by_end]
+        self.left = IntervalTree(left) if left else None
+        self.right = IntervalTree(right) if right else None
+
+    def stab(self, point):
+        results = []
+        node = self
+        while node is not None and node.center is not None:
+            if point < node.center:
+                results.extend(node.by_start[:bisect_right(node.starts, point)])
+                node = node.left
+            elif point > node.center:
+                results.extend(node.by_end[:bisect_right(node.negated_ends, -point)])
+                node = node.right
+            else:
+                results.extend(node.by_start)
+                break
+        return results
+
+
+class PassIntervalIndex:
+    """
+    In-process index of unused, unexpired pass windows: one interval tree
+    over all passes for "who is covered at T", plus each student's windows
+    sorted by start for per-student and overlap checks.
+    """
+
+    def __init__(self, rows):
+        intervals = []
+        self.by_student = {}
+        for pass_id, student_id, valid_from, valid_until in rows:
+            interval = (valid_from.timestamp(), valid_until.timestamp(), (student_id, pass_id))
+            intervals.append(interval)
+            self.by_student.setdefault(student_id, []).append(interval)
+        for student_intervals in self.by_student.values():
+            student_intervals.sort()
+        self.tree = IntervalTree(intervals)
+
+    def covered_students(self, at):
+        return {value[0] for _, _, value in self.tree.stab(at.timestamp())}
+
+    def overlapping_passes(self, student_id, start, end):
+        start, end = start.timestamp(), end.timestamp()
+        student_intervals = self.by_student.get(student_id, [])
+        # Intervals starting after `end` cannot overlap; the rest are checked by end.
+        candidates = student_intervals[:bisect_right(student_intervals, (end, float('inf')))]
+        return [value[1] for interval_start, interval_end, value in candidates if interval_end >= start]
+
+
+_pass_index = None
+_pass_rows = None
+_pass_index_synced_through = 0
+_pass_index_checked_at = 0.0
+_pass_index_lock = threading.Lock()
+
+def _unused_pass_rows(**filters):
+    return StudentBusPass.objects.filter(
+        used_at__isnull=True,
+        valid_until__gte=timezone.now(),
+        **filters
+    ).order_by().values_list('student__university_id', 'id', 'student_id', 'valid_from', 'valid_until')
+
+def _load_pass_rows(**filters):
+    rows = {}
+    for university_id, *row in _unused_pass_rows(**filters).iterator(chunk_size=5000):
+        rows.setdefault(university_id, set()).add(tuple(row))
+    return rows
+
+def _refresh_pass_rows(changed_university_ids):
+    """Reloads the passes of the given students; True if any differ from what is held."""
+    fresh = _load_pass_rows(student__university_id__in=changed_university_ids)
+    changed = False
+    for university_id in changed_university_ids:
+        rows = fresh.get(university_id)
+        if rows != _pass_rows.get(university_id):
+            changed = True
+            if rows:
+                _pass_rows[university_id] = rows
+            else:
+                _pass_rows.pop(university_id, None)
+    return changed
+
+def _build_pass_index():
+    now = timezone.now()
+    return PassIntervalIndex(row for rows in _pass_rows.values() for row in rows if row[3] >= now)
+
+def get_pass_index():
+    """
+    Loaded once, then kept current from the roster change log, which
+    records every pass change: at most every SHARED_VERSION_CHECK_SECONDS
+    the passes of students changed since the last check are reloaded, and
+    the tree is rebuilt in memory only if they differ. A pass change
+    therefore reaches every worker within that delay. Changes newer than
+    the settled roster version are read again on each check, so one that
+    commits out of id order is not missed (see get_roster_version).
+    """
+    global _pass_index, _pass_rows, _pass_index_synced_through, _pass_index_checked_at
+    now = time.monotonic()
+    with _pass_index_lock:
+        if _pass_index is not None and now - _pass_index_checked_at < settings.SHARED_VERSION_CHECK_SECONDS:
+            return _pass_index
+
+        synced_through = get_roster_version()
+        # A worker idle past ROSTER_CHANGE_RETENTION_DAYS would miss pruned changes.
+        if _pass_index is None or _pass_index_synced_through < get_oldest_delta_version():
+            _pass_rows = _load_pass_rows()
+            _pass_index = _build_pass_index()
+        else:
+            changed_university_ids = set(
+                RosterChange.objects.filter(id__gt=_pass_index_synced_through).values_list('university_id', flat=True)
+            )
+            if changed_university_ids and _refresh_pass_rows(changed_university_ids):
+                _pass_index = _build_pass_index()
+        _pass_index_synced_through = synced_through
+        _pass_index_checked_at = now
+        return _pass_index
@@ -1,25 +1,37 @@
+import hmac
+import logging
 from rest_framework.permissions import BasePermission
 from django.conf import settings
+from .readers import get_reader_for_key
+
+logger = logging.getLogger(__name__)
 
 class APIKeyCheck(BasePermission):
     """
-    Custom permission to only allow requests that provide the valid
-    BUS_API_KEY in the 'X-API-Key' header.
+    Custom permission to only allow requests that provide a valid key in
+    the 'X-API-Key' header: either a registered BusReader's key or the
+    legacy shared BUS_API_KEY. A matched reader is attached to the request
+    as request.bus_reader.
     """
     message = 'Invalid or missing API Key.'
 
     def has_permission(self, request, view):
         api_key_sent = request.headers.get('X-API-Key')
+
+        # 1. Fail if client sent nothing
+        if not api_key_sent:
+            return False
+
+        # 2. Registered readers (cached in process, no DB query per request)
+        reader = get_reader_for_key(api_key_sent)
+        if reader:
+            request.bus_reader = reader
+            return True
+
+        # 3. Legacy shared key. Fail safe if the server hasn't configured one.
         server_key = getattr(settings, 'BUS_API_KEY', None)
-        
-        # 1. Fail Safe: If server hasn't configured a key, block everything.
         if not server_key:
-            print("SECURITY WARNING: BUS_API_KEY is not set in settings. Blocking request.")
+            logger.warning("BUS_API_KEY is not set and no registered reader matched. Blocking request.")
             return False
 
-        # 2. Fail if client sent nothing
-        if not api_key_sent:
-            return False
-        
-        # 3. Standard Check
-        return api_key_sent == server_key
\ No newline at end of file
+        return hmac.compare_digest(api_key_sent.encode(), server_key.encode())
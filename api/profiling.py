@@ -0,0 +1,144 @@
+"""
+On-demand profiling of individual requests.
+
+A request is profiled when an admin sends the PROFILE_HEADER, or when it
+falls into the PROFILE_SAMPLE_RATE fraction of all requests. Each profiled
+request writes a cProfile dump (.pstats) and a folded-stack file (.folded,
+the input format of flamegraph.pl and speedscope) to PROFILE_OUTPUT_DIR.
+File names carry the view name, SQL query count and duration; the
+aggregate_profiles command merges them.
+
+Requests that are not profiled pay one header lookup and, when sampling
+is enabled, one random draw.
+"""
+import cProfile
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'HTTP_X_PROFILE_REQUEST'
+
+PROFILE_NAME_RE = re.compile(
+    r'^(?P<view>.+)__(?P<stamp>\d{8}T\d{6})__q(?P<queries>\d+)__(?P<ms>\d+)ms__[0-9a-f]+\.(?P<kind>pstats|folded)$'
+)
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval into folded-stack counts."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-stack-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _is_admin(request):
+    # The view has not authenticated the request yet; run the API's own
+    # authenticators so JWT cookie users are recognised.
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        return drf_request.user.is_staff
+    except APIException:
+        return False
+
+
+def _view_tag(request):
+    match = getattr(request, 'resolver_match', None)
+    name = (match.view_name or match.func.__name__) if match else 'unresolved'
+    return re.sub(r'[^A-Za-z0-9_.-]+', '-', name)
+
+
+class RequestProfilerMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample_rate = settings.PROFILE_SAMPLE_RATE
+        if PROFILE_HEADER in request.META:
+            if not _is_admin(request):
+                return self.get_response(request)
+        elif not (sample_rate and random.random() < sample_rate):
+            return self.get_response(request)
+        return self._profile(request)
+
+    def _profile(self, request):
+        profiler = cProfile.Profile()
+        queries = QueryCounter()
+        sampler = StackSampler(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            stack.enter_context(sampler)
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        elapsed_ms = round((time.perf_counter() - started) * 1000)
+
+        try:
+            os.makedirs(settings.PROFILE_OUTPUT_DIR, exist_ok=True)
+            base_name = '__'.join([
+                _view_tag(request),
+                time.strftime('%Y%m%dT%H%M%S'),
+                f'q{queries.count}',
+                f'{elapsed_ms}ms',
+                uuid.uuid4().hex[:8],
+            ])
+            base_path = os.path.join(settings.PROFILE_OUTPUT_DIR, base_name)
+            profiler.dump_stats(f'{base_path}.pstats')
+            sampler.write(f'{base_path}.folded')
+            response['X-Profile-Id'] = base_name
+        except OSError:
+            logger.exception("Could not write request profile.")
+        return response
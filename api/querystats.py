@@ -0,0 +1,163 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import traceback
+from collections import deque
+from contextvars import ContextVar
+from functools import lru_cache
+from django.conf import settings
+from django.utils import timezone
+from django.utils.deprecation import MiddlewareMixin
+
+_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w.\"])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_VALUES_LIST_RE = re.compile(r"(VALUES\s*\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+", re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Name of the view whose request issued the current queries.
+current_view = ContextVar('query_stats_view', default=None)
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """
+    Normalises SQL so that queries differing only in literal values or in
+    the length of IN / VALUES lists share one fingerprint.
+    """
+    normalized = sql.replace('%s', '?')
+    normalized = _STRING_LITERAL_RE.sub('?', normalized)
+    normalized = _NUMBER_RE.sub('?', normalized)
+    normalized = _PLACEHOLDER_LIST_RE.sub('(...)', normalized)
+    normalized = _VALUES_LIST_RE.sub(r'\1', normalized)
+    normalized = _WHITESPACE_RE.sub(' ', normalized).strip()
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16], normalized
+
+
+class _FingerprintStats:
+    __slots__ = ('sql', 'calls', 'total_ms', 'max_ms', 'rows', 'recent_ms', 'slow_stack')
+
+    def __init__(self, sql, sample_size):
+        self.sql = sql
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.recent_ms = deque(maxlen=sample_size)
+        self.slow_stack = None
+
+
+class QueryStats:
+    """
+    Per-process aggregate of executed SQL keyed by (fingerprint, view), a
+    database-agnostic counterpart of pg_stat_statements. Installed as an
+    execute wrapper on every connection. p95 is computed over the most
+    recent sample_size calls of each entry.
+    """
+
+    def __init__(self, sample_size=500):
+        self.sample_size = sample_size
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._started_at = timezone.now()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            rowcount = getattr(context.get('cursor'), 'rowcount', -1)
+            self.record(sql, elapsed_ms, max(rowcount, 0))
+
+    def record(self, sql, elapsed_ms, rows):
+        fingerprint_id, normalized = fingerprint(sql)
+        key = (fingerprint_id, current_view.get())
+        stack = None
+        if settings.QUERY_STATS_CAPTURE_STACKS and elapsed_ms >= settings.QUERY_STATS_SLOW_MS:
+            stack = _project_stack()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _FingerprintStats(normalized, self.sample_size)
+            entry.calls += 1
+            entry.total_ms += elapsed_ms
+            entry.max_ms = max(entry.max_ms, elapsed_ms)
+            entry.rows += rows
+            entry.recent_ms.append(elapsed_ms)
+            if stack is not None:
+                entry.slow_stack = stack
+
+    def top(self, sort='total_ms', limit=20, view=None):
+        with self._lock:
+            snapshot = [
+                (key, entry.sql, entry.calls, entry.total_ms, entry.max_ms, entry.rows, sorted(entry.recent_ms), entry.slow_stack)
+                for key, entry in self._entries.items()
+                if view is None or key[1] == view
+            ]
+
+        results = []
+        for (fingerprint_id, view_name), sql, calls, total_ms, max_ms, rows, recent, slow_stack in snapshot:
+            results.append({
+                "fingerprint": fingerprint_id,
+                "view": view_name,
+                "sql": sql,
+                "calls": calls,
+                "total_ms": round(total_ms, 2),
+                "mean_ms": round(total_ms / calls, 3),
+                "p95_ms": round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 3),
+                "max_ms": round(max_ms, 3),
+                "rows": rows,
+                "slow_stack": slow_stack,
+            })
+        results.sort(key=lambda result: result[sort], reverse=True)
+        return results[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._entries = {}
+            self._started_at = timezone.now()
+
+    @property
+    def started_at(self):
+        return self._started_at
+
+
+SORT_FIELDS = ('total_ms', 'calls', 'mean_ms', 'p95_ms', 'max_ms', 'rows')
+
+query_stats = QueryStats()
+
+
+def _project_stack():
+    # Only frames from this project; Django and driver frames are noise here.
+    return [
+        f"{os.path.relpath(frame.filename, settings.BASE_DIR)}:{frame.lineno} in {frame.name}"
+        for frame in traceback.extract_stack()[:-3]
+        if frame.filename.startswith(str(settings.BASE_DIR)) and 'site-packages' not in frame.filename
+    ]
+
+
+def install_query_stats(sender, connection, **kwargs):
+    """connection_created receiver; adds the recorder to each new connection once."""
+    if query_stats not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_stats)
+
+
+class QueryStatsViewMiddleware(MiddlewareMixin):
+    """Tags queries with the name of the view that issued them."""
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        request._query_stats_token = current_view.set(match.view_name or view_func.__name__)
+
+    def process_response(self, request, response):
+        token = getattr(request, '_query_stats_token', None)
+        if token is not None:
+            try:
+                current_view.reset(token)
+            except ValueError:
+                current_view.set(None)
+        return response
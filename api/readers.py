@@ -0,0 +1,50 @@
+import hmac
+import threading
+from dataclasses import dataclass
+from .models import BusReader
+from .versions import VersionCounter
+
+registry_version = VersionCounter('bus_reader_registry')
+
+
+@dataclass(frozen=True)
+class ReaderIdentity:
+    id: int
+    name: str
+    bus_number: str
+    key_hash: str
+
+
+_registry = None
+_registry_version = None
+_registry_lock = threading.Lock()
+
+def _get_registry():
+    """
+    Enabled readers keyed by key prefix, loaded once per process. Reader
+    changes bump a shared version so every worker reloads within
+    SHARED_VERSION_CHECK_SECONDS; between checks a key lookup makes no
+    database query.
+    """
+    global _registry, _registry_version
+    version = registry_version.current()
+    with _registry_lock:
+        if _registry is None or _registry_version != version:
+            _registry = {
+                reader.key_prefix: ReaderIdentity(reader.id, reader.name, reader.bus_number, reader.key_hash)
+                for reader in BusReader.objects.filter(is_enabled=True)
+            }
+            _registry_version = version
+        return _registry
+
+def get_reader_for_key(raw_key):
+    reader = _get_registry().get(raw_key[:BusReader.KEY_PREFIX_LENGTH])
+    if reader and hmac.compare_digest(reader.key_hash, BusReader.hash_key(raw_key)):
+        return reader
+    return None
+
+def invalidate_reader_registry():
+    registry_version.bump()
+    global _registry
+    with _registry_lock:
+        _registry = None
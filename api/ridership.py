@@ -0,0 +1,111 @@
+import threading
+from collections import Counter
+from datetime import datetime
+from django.conf import settings
+from django.utils import timezone
+from .models import AttendanceLog
+
+
+class RidershipCounters:
+    """
+    In-memory per-bus scan counters for the current day plus a ring buffer of
+    one-minute buckets covering the last window_minutes. Reads cost
+    O(buses * minutes) and never touch the database once loaded.
+
+    Counts are keyed by (direction, status). The counters are filled lazily
+    from today's AttendanceLog rows on first use and then kept current by the
+    scan event hub, which only hears other workers' scans when
+    SCAN_EVENT_BACKEND is a cross-process backend.
+    """
+
+    def __init__(self, window_minutes):
+        self.window_minutes = window_minutes
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._loaded_ids = set()
+        self._day = None
+        self._today = {}
+        self._buckets = [None] * window_minutes
+
+    def _record(self, bus_number, direction, status, timestamp):
+        day = timezone.localdate(timestamp)
+        if self._day is None or day > self._day:
+            self._day = day
+            self._today = {}
+            # The load only covered the previous day.
+            self._loaded_ids = set()
+        if day == self._day:
+            self._today.setdefault(bus_number, Counter())[(direction, status)] += 1
+
+        minute = int(timestamp.timestamp() // 60)
+        slot = minute % self.window_minutes
+        bucket = self._buckets[slot]
+        if bucket is None or bucket[0] < minute:
+            bucket = (minute, {})
+            self._buckets[slot] = bucket
+        if bucket[0] == minute:
+            bucket[1].setdefault(bus_number, Counter())[(direction, status)] += 1
+
+    def _load(self):
+        start_of_day = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        rows = AttendanceLog.objects.filter(timestamp__gte=start_of_day).order_by('timestamp').values_list(
+            'id', 'timestamp', 'bus_number', 'direction', 'status'
+        )
+        for log_id, timestamp, bus_number, direction, status in rows.iterator(chunk_size=2000):
+            self._record(bus_number, direction, status, timestamp)
+            self._loaded_ids.add(log_id)
+        self._loaded = True
+
+    def record_event(self, event):
+        with self._lock:
+            # Before the first load the database already holds this scan, and
+            # scans committed before the load finished were counted by it.
+            # Ids commit out of order, so a scan with an id below the newest
+            # loaded one may still be missing from the load; only the loaded
+            # ids themselves are skipped.
+            if not self._loaded or event['id'] in self._loaded_ids:
+                return
+            timestamp = datetime.fromisoformat(event['timestamp'])
+            self._record(event['bus_number'], event['direction'], event['status'], timestamp)
+
+    def snapshot(self, minutes):
+        with self._lock:
+            if not self._loaded:
+                self._load()
+
+            today = {}
+            if self._day == timezone.localdate():
+                today = {bus: dict(counts) for bus, counts in self._today.items()}
+
+            current_minute = int(timezone.now().timestamp() // 60)
+            recent = {}
+            for bucket in self._buckets:
+                if bucket is None or current_minute - bucket[0] >= minutes:
+                    continue
+                for bus_number, counts in bucket[1].items():
+                    recent.setdefault(bus_number, Counter()).update(counts)
+
+        return today, recent
+
+
+ridership_counters = RidershipCounters(getattr(settings, 'RIDERSHIP_WINDOW_MINUTES', 60))
+
+
+def _format_counts(counts):
+    by_direction = {}
+    for (direction, status), count in counts.items():
+        by_direction.setdefault(direction, {})[status] = count
+    by_direction['total'] = sum(counts.values())
+    return by_direction
+
+def get_bus_ridership(minutes):
+    today, recent = ridership_counters.snapshot(minutes)
+    empty = Counter()
+    return [
+        {
+            "bus_number": bus_number,
+            "today": _format_counts(today.get(bus_number, empty)),
+            "recent": _format_counts(recent.get(bus_number, empty)),
+        }
+        for bus_number in sorted(set(today) | set(recent), key=lambda bus: (bus is None, str(bus)))
+    ]
@@ -0,0 +1,121 @@
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Max, Prefetch
+from django.utils import timezone
+from .models import Student, StudentBusPass, RosterChange
+from .schedule_utils import get_schedule_day_masks
+
+
+def record_roster_change(*university_ids):
+    RosterChange.objects.bulk_create(
+        [RosterChange(university_id=university_id) for university_id in set(university_ids) if university_id]
+    )
+
+class RosterSnapshotRequired(Exception):
+    """The changes since the requested version have been pruned; fetch a full snapshot."""
+
+def get_oldest_delta_version():
+    """
+    The oldest version a delta can still be built from. Changes older than
+    ROSTER_CHANGE_RETENTION_DAYS are pruned (see prune_roster_changes), so a
+    reader that synced before them must start again from a snapshot.
+    """
+    oldest_id = RosterChange.objects.order_by('id').values_list('id', flat=True).first()
+    return oldest_id - 1 if oldest_id else 0
+
+def prune_roster_changes(before):
+    """
+    Deletes roster changes recorded before `before`, always keeping the
+    newest so get_oldest_delta_version can tell pruned history from none.
+    Returns the number deleted.
+    """
+    newest_id = get_latest_change_id()
+    return RosterChange.objects.filter(changed_at__lt=before, id__lt=newest_id).delete()[0]
+
+def get_latest_change_id():
+    return RosterChange.objects.aggregate(version=Max('id'))['version'] or 0
+
+def get_roster_version():
+    """
+    The version readers sync from: the newest change older than
+    ROSTER_SETTLE_SECONDS. Ids are allocated at insert but become visible
+    at commit, so a change can appear below an id a reader has already
+    synced past. Holding the version back keeps recent changes in every
+    delta until they are old enough that no transaction still writing
+    below them can be open. A transaction that stays open longer than the
+    settle window can still be missed.
+    """
+    settled_before = timezone.now() - timedelta(seconds=settings.ROSTER_SETTLE_SECONDS)
+    # Walks the primary key backwards over the recent rows only.
+    settled = RosterChange.objects.filter(changed_at__lt=settled_before).order_by('-id').values_list('id', flat=True).first()
+    return settled or 0
+
+def get_schedule_version(day_masks):
+    encoded = json.dumps(day_masks, sort_keys=True).encode()
+    return hashlib.sha1(encoded).hexdigest()[:12]
+
+def _build_roster_entries(students_queryset):
+    """
+    Compact per-student rows: [university_id, schedule_id, [[from, until], ...]]
+    with pass windows as epoch seconds. Only unused passes that have not expired
+    are shipped, since those are the only ones a reader can still honour.
+    """
+    now = timezone.now()
+    unused_passes = StudentBusPass.objects.filter(
+        used_at__isnull=True,
+        valid_until__gte=now
+    ).only('student_id', 'valid_from', 'valid_until').order_by('valid_from')
+
+    students = students_queryset.only('id', 'university_id', 'schedule_id').prefetch_related(
+        Prefetch('bus_passes', queryset=unused_passes, to_attr='unused_passes')
+    )
+
+    return [
+        [
+            student.university_id,
+            student.schedule_id,
+            [[int(p.valid_from.timestamp()), int(p.valid_until.timestamp())] for p in student.unused_passes]
+        ]
+        for student in students
+    ]
+
+def build_roster_snapshot():
+    version = get_roster_version()
+    day_masks = get_schedule_day_masks()
+    return {
+        "version": version,
+        "schedule_version": get_schedule_version(day_masks),
+        "schedules": day_masks,
+        "students": _build_roster_entries(Student.objects.order_by('university_id')),
+    }
+
+def build_roster_delta(since_version, schedule_version=None):
+    """Raises RosterSnapshotRequired when since_version predates the retained changes."""
+    if since_version < get_oldest_delta_version():
+        raise RosterSnapshotRequired()
+    version = get_roster_version()
+    # Everything visible is sent, including changes above the held-back
+    # version; those are simply sent again next time.
+    changed_ids = set(
+        RosterChange.objects.filter(id__gt=since_version, id__lte=get_latest_change_id())
+        .values_list('university_id', flat=True)
+    )
+
+    students = _build_roster_entries(Student.objects.filter(university_id__in=changed_ids))
+    present_ids = {entry[0] for entry in students}
+
+    delta = {
+        "version": version,
+        "students": students,
+        "removed": sorted(changed_ids - present_ids),
+    }
+
+    day_masks = get_schedule_day_masks()
+    current_schedule_version = get_schedule_version(day_masks)
+    if schedule_version != current_schedule_version:
+        delta["schedule_version"] = current_schedule_version
+        delta["schedules"] = day_masks
+
+    return delta
@@ -1,51 +1,198 @@
-import pandas as pd
+import csv
 import os
+import threading
+from dataclasses import dataclass
 from django.conf import settings
-from django.core.cache import cache
+from django.utils import timezone
+from .models import Schedule
+from .versions import VersionCounter
 
 SCHEDULE_FILE_PATH = os.path.join(settings.BASE_DIR, 'schedules.csv')
-SCHEDULE_CACHE_KEY = 'schedules_data'
-
-def _load_and_cache_schedules():
-    
-    try:
-        df = pd.read_csv(SCHEDULE_FILE_PATH, dtype=str)
-        
-        schedules_dict = {}
-        for index, row in df.iterrows():
-            days_list = []
-            if pd.notna(row['days']):
-                days_list = [day.strip() for day in row['days'].split('|')]
-            
-            schedules_dict[row['schedule_id']] = {
-                'course': row['course'],
-                'year': row['year'],
-                'days_list': days_list
-            }
-        
-        cache.set(SCHEDULE_CACHE_KEY, schedules_dict, 3600)
-        return schedules_dict
-        
-    except FileNotFoundError:
-        raise Exception(f"Configuration Error: 'schedules.csv' not found at {SCHEDULE_FILE_PATH}")
-    except Exception as e:
-        raise Exception(f"Data Processing Error in schedules.csv: {str(e)}")
+schedule_table_version = VersionCounter('schedule_table')
+WEEKDAY_CODES = ['Mo', 'Tu', 'We', 'Th', 'Fr', 'Sa', 'Su']
+
+
+def get_day_mask(days_list):
+    """
+    Packs a days_list such as ['Mo', 'We'] into a 7-bit mask (bit 0 = Monday),
+    matching datetime.weekday().
+    """
+    mask = 0
+    for day in days_list:
+        code = day[:2].title()
+        if code in WEEKDAY_CODES:
+            mask |= 1 << WEEKDAY_CODES.index(code)
+    return mask
+
+def parse_time_window(window):
+    """'07:00-10:30' -> (420, 630): minutes since local midnight, end exclusive."""
+    start, end = (part.strip() for part in window.split('-'))
+    bounds = []
+    for value in (start, end):
+        hours, minutes = (int(part) for part in value.split(':'))
+        if not (0 <= hours and 0 <= minutes < 60 and hours * 60 + minutes <= 24 * 60):
+            raise ValueError(f"Invalid time '{value}' in window '{window}'.")
+        bounds.append(hours * 60 + minutes)
+    if bounds[0] >= bounds[1]:
+        raise ValueError(f"Window '{window}' must end after it starts.")
+    return tuple(bounds)
+
+
+@dataclass(frozen=True)
+class CompiledSchedule:
+    schedule_id: str
+    course: str
+    year: str
+    day_mask: int
+    windows: tuple
+
+    def runs_on(self, weekday):
+        return bool(self.day_mask >> weekday & 1)
+
+    def allows(self, moment):
+        """
+        True when moment, in the project's TIME_ZONE, is on a scheduled day
+        and inside a time window, if any.
+        """
+        if timezone.is_aware(moment):
+            # Not localtime(): looking up the active time zone costs more
+            # than the rest of the check put together.
+            moment = moment.astimezone(timezone.get_default_timezone())
+        if not self.day_mask >> moment.weekday() & 1:
+            return False
+        if not self.windows:
+            return True
+        minute = moment.hour * 60 + moment.minute
+        return any(start <= minute < end for start, end in self.windows)
+
+    def as_dict(self):
+        return {
+            'course': self.course,
+            'year': self.year,
+            'days_list': [code for weekday, code in enumerate(WEEKDAY_CODES) if self.day_mask >> weekday & 1],
+            'time_windows': [f'{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d}' for start, end in self.windows],
+        }
+
+
+class ScheduleTable:
+    def __init__(self, schedules):
+        self.schedules = schedules
+        self.details = {schedule_id: schedule.as_dict() for schedule_id, schedule in schedules.items()}
+        self.day_masks = {schedule_id: schedule.day_mask for schedule_id, schedule in schedules.items()}
+
+
+def compile_schedules(rows):
+    """rows: (schedule_id, course, year, day_mask, time_windows) tuples."""
+    return ScheduleTable({
+        str(schedule_id): CompiledSchedule(
+            str(schedule_id), course, year, day_mask,
+            tuple(sorted(parse_time_window(window) for window in time_windows or [])),
+        )
+        for schedule_id, course, year, day_mask, time_windows in rows
+    })
+
+
+_table = None
+_table_version = None
+_table_lock = threading.Lock()
+
+def get_schedule_table():
+    """
+    The compiled schedules, loaded once per process. Schedule changes bump a
+    shared version that every worker picks up within
+    SHARED_VERSION_CHECK_SECONDS; between checks a lookup is a dict access
+    and a bit test, with no I/O.
+    """
+    global _table, _table_version
+    version = schedule_table_version.current()
+    with _table_lock:
+        if _table is None or _table_version != version:
+            _table = compile_schedules(
+                Schedule.objects.values_list('schedule_id', 'course', 'year', 'day_mask', 'time_windows')
+            )
+            _table_version = version
+        return _table
+
+def invalidate_schedule_table():
+    schedule_table_version.bump()
+    global _table
+    with _table_lock:
+        _table = None
+
 
 def get_all_schedules():
-    schedules = cache.get(SCHEDULE_CACHE_KEY)
-    if not schedules:
-        schedules = _load_and_cache_schedules()
-    return schedules
+    return get_schedule_table().details
 
 def get_student_schedule_by_id(schedule_id):
     if not schedule_id:
         return {"error": "Student has no schedule_id assigned."}
-        
-    all_schedules = get_all_schedules()
-    
-    schedule_data = all_schedules.get(str(schedule_id))
-    
+
+    schedule_data = get_all_schedules().get(str(schedule_id))
+
     if not schedule_data:
-        raise Exception(f"Schedule ID '{schedule_id}' not found in schedules.csv.")
-    
-    return schedule_data
\ No newline at end of file
+        raise Exception(f"Schedule ID '{schedule_id}' not found.")
+
+    return schedule_data
+
+def is_scheduled_at(schedule_id, moment):
+    """
+    Whether a student on schedule_id may ride at moment. A student without a
+    schedule never may; an unknown schedule id raises.
+    """
+    if not schedule_id:
+        return False
+    schedule = get_schedule_table().schedules.get(str(schedule_id))
+    if schedule is None:
+        raise Exception(f"Schedule ID '{schedule_id}' not found.")
+    return schedule.allows(moment)
+
+def get_schedule_day_masks():
+    return get_schedule_table().day_masks
+
+
+def read_schedule_csv(path=SCHEDULE_FILE_PATH):
+    """
+    Parses a schedules CSV (schedule_id, course, year, days as 'Mo|We', and
+    an optional time_windows column as '07:00-10:00|14:00-18:00') into
+    Schedule field dicts.
+    """
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+
+    schedules = []
+    for row in rows:
+        windows = [window.strip() for window in (row.get('time_windows') or '').split('|') if window.strip()]
+        for window in windows:
+            parse_time_window(window)
+        schedules.append({
+            'schedule_id': row['schedule_id'],
+            'course': row['course'],
+            'year': row['year'] or '',
+            'day_mask': get_day_mask([day.strip() for day in (row['days'] or '').split('|') if day.strip()]),
+            'time_windows': windows,
+        })
+    return schedules
+
+def load_schedules_from_csv(path=SCHEDULE_FILE_PATH, prune=False):
+    """
+    Creates or updates a Schedule per CSV row; with prune, deletes schedules
+    missing from the file. Returns (created, updated, deleted).
+    """
+    schedules = read_schedule_csv(path)
+    existing = {schedule.schedule_id: schedule for schedule in Schedule.objects.all()}
+    created = updated = 0
+    for fields in schedules:
+        schedule = existing.get(fields['schedule_id'])
+        if schedule is None:
+            Schedule(**fields).save()
+            created += 1
+        elif any(getattr(schedule, name) != value for name, value in fields.items()):
+            for name, value in fields.items():
+                setattr(schedule, name, value)
+            schedule.save()
+            updated += 1
+
+    deleted = 0
+    if prune:
+        deleted = Schedule.objects.exclude(schedule_id__in=[fields['schedule_id'] for fields in schedules]).delete()[0]
+    return created, updated, deleted
@@ -0,0 +1,227 @@
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.filters import BaseFilterBackend
+from .models import Student, Parent, SearchIndexChange
+
+
+def normalize_search_text(*parts):
+    """
+    Lower-cased, accent-stripped, whitespace-collapsed text used for both the
+    stored search column and incoming queries, so "José" matches "jose".
+    """
+    text = ' '.join(str(part) for part in parts if part)
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.lower().split())
+
+def build_student_search_text(student):
+    user = student.user
+    return normalize_search_text(
+        student.university_id,
+        user.first_name if user else None,
+        user.last_name if user else None,
+        student.university_email,
+    )
+
+def build_parent_search_text(parent):
+    user = parent.user
+    return normalize_search_text(user.first_name, user.last_name, user.email, parent.phone_number)
+
+
+class NormalizedSearchFilter(BaseFilterBackend):
+    """
+    Drop-in replacement for SearchFilter on models with a search_text column.
+    Every term must appear in search_text; on Postgres the trigram GIN index
+    serves these LIKE '%term%' lookups instead of a sequential scan.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        terms = normalize_search_text(request.query_params.get(self.search_param, '')).split()
+        for term in terms:
+            queryset = queryset.filter(search_text__contains=term)
+        return queryset
+
+
+class PrefixIndex:
+    """
+    Sorted array of (token, kind, pk) used for typeahead. A prefix lookup is a
+    bisect followed by a short forward scan, independent of roster size.
+    """
+
+    def __init__(self):
+        self._entries = []
+        self._tokens_by_key = {}
+        self._labels = {}
+
+    @classmethod
+    def build(cls, entries):
+        """Builds an index from (kind, pk, tokens, label) with one sort, not one insort per token."""
+        index = cls()
+        for kind, pk, tokens, label in entries:
+            tokens = sorted(set(token for token in tokens if token))
+            index._entries.extend((token, kind, pk) for token in tokens)
+            index._tokens_by_key[(kind, pk)] = tokens
+            index._labels[(kind, pk)] = label
+        index._entries.sort()
+        return index
+
+    def add(self, kind, pk, tokens, label):
+        key = (kind, pk)
+        self.remove(kind, pk)
+        tokens = sorted(set(token for token in tokens if token))
+        for token in tokens:
+            insort(self._entries, (token, kind, pk))
+        self._tokens_by_key[key] = tokens
+        self._labels[key] = label
+
+    def remove(self, kind, pk):
+        key = (kind, pk)
+        for token in self._tokens_by_key.pop(key, ()):
+            position = bisect_left(self._entries, (token, kind, pk))
+            if position < len(self._entries) and self._entries[position] == (token, kind, pk):
+                del self._entries[position]
+        self._labels.pop(key, None)
+
+    def search(self, prefix, limit):
+        results = []
+        seen = set()
+        position = bisect_left(self._entries, (prefix,))
+        while position < len(self._entries) and len(results) < limit:
+            token, kind, pk = self._entries[position]
+            if not token.startswith(prefix):
+                break
+            if (kind, pk) not in seen:
+                seen.add((kind, pk))
+                results.append(self._labels[(kind, pk)])
+            position += 1
+        return results
+
+
+def _student_entry(student):
+    user = student.user
+    name = user.get_full_name() if user else ''
+    tokens = [student.university_id.lower(), student.university_email.split('@')[0].lower()]
+    tokens += normalize_search_text(name).split()
+    label = {"type": "student", "university_id": student.university_id, "name": name}
+    return tokens, label
+
+def _parent_entry(parent):
+    user = parent.user
+    name = user.get_full_name()
+    tokens = [user.email.split('@')[0].lower()] + normalize_search_text(name).split()
+    label = {"type": "parent", "id": parent.id, "name": name}
+    return tokens, label
+
+
+_index = None
+_index_lock = threading.Lock()
+_index_synced_at = None
+_index_checked_at = 0.0
+_applied_change_ids = set()
+
+def _students(**filters):
+    return Student.objects.filter(**filters).select_related('user')
+
+def _parents(**filters):
+    return Parent.objects.filter(**filters).select_related('user')
+
+def _build_index():
+    def entries():
+        for student in _students().iterator(chunk_size=5000):
+            yield ('student', student.pk, *_student_entry(student))
+        for parent in _parents().iterator(chunk_size=5000):
+            yield ('parent', parent.pk, *_parent_entry(parent))
+    return PrefixIndex.build(entries())
+
+def _apply_changes(index, changes):
+    """Re-reads the changed students and parents; rows that are gone are removed."""
+    for kind, queryset, make_entry in (('student', _students, _student_entry), ('parent', _parents, _parent_entry)):
+        pks = {object_id for change_kind, object_id in changes if change_kind == kind}
+        if not pks:
+            continue
+        for instance in queryset(pk__in=pks):
+            index.add(kind, instance.pk, *make_entry(instance))
+            pks.discard(instance.pk)
+        for pk in pks:
+            index.remove(kind, pk)
+
+def _get_index():
+    """
+    Built once, then kept current from the SearchIndexChange log, polled at
+    most every SHARED_VERSION_CHECK_SECONDS. Changes are applied entry by
+    entry; only a '*' change or a gap longer than the log's retention
+    forces a rebuild. Ids are allocated before their transaction commits,
+    so each poll re-reads the last ROSTER_SETTLE_SECONDS of changes and
+    skips the ids it has already applied.
+    """
+    global _index, _index_synced_at, _index_checked_at, _applied_change_ids
+    checked_at = time.monotonic()
+    with _index_lock:
+        if _index is not None and checked_at - _index_checked_at < settings.SHARED_VERSION_CHECK_SECONDS:
+            return _index
+
+        now = timezone.now()
+        settle = timedelta(seconds=settings.ROSTER_SETTLE_SECONDS)
+        retention = timedelta(seconds=settings.SEARCH_INDEX_CHANGE_RETENTION_SECONDS)
+        rebuild = _index is None or now - _index_synced_at > retention - settle
+        since = now - settle if rebuild else _index_synced_at - settle
+        changes = list(SearchIndexChange.objects.filter(changed_at__gte=since).values_list('id', 'kind', 'object_id'))
+        new_changes = [(kind, object_id) for change_id, kind, object_id in changes if change_id not in _applied_change_ids]
+
+        if rebuild or any(kind == '*' for kind, _ in new_changes):
+            # Changes read above are already reflected in the rebuilt index.
+            _index = _build_index()
+        elif new_changes:
+            _apply_changes(_index, new_changes)
+
+        _applied_change_ids = {change_id for change_id, _, _ in changes}
+        _index_synced_at = now
+        _index_checked_at = checked_at
+        return _index
+
+def autocomplete(query, limit=10):
+    prefix = normalize_search_text(query)
+    if not prefix:
+        return []
+    return _get_index().search(prefix, limit)
+
+def _record_change(kind, pk=None):
+    """
+    Logs a change for the other workers, in the caller's transaction so it
+    commits (or rolls back) with the change itself, and prunes expired rows.
+    """
+    now = timezone.now()
+    SearchIndexChange.objects.create(kind=kind, object_id=pk)
+    retention = timedelta(seconds=settings.SEARCH_INDEX_CHANGE_RETENTION_SECONDS)
+    SearchIndexChange.objects.filter(changed_at__lt=now - retention).delete()
+
+def index_student(student):
+    with _index_lock:
+        if _index is not None:
+            _index.add('student', student.pk, *_student_entry(student))
+    _record_change('student', student.pk)
+
+def index_parent(parent):
+    with _index_lock:
+        if _index is not None:
+            _index.add('parent', parent.pk, *_parent_entry(parent))
+    _record_change('parent', parent.pk)
+
+def unindex(kind, pk):
+    with _index_lock:
+        if _index is not None:
+            _index.remove(kind, pk)
+    _record_change(kind, pk)
+
+def invalidate_search_index():
+    """Makes every worker rebuild its index, e.g. after a bulk load that bypassed the signals."""
+    global _index
+    with _index_lock:
+        _index = None
+    _record_change('*')
@@ -1,8 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Parent, Student, AttendanceLog, StudentBusPass, BusPassRequest
+from .models import Parent, Student, AttendanceLog, StudentBusPass, BusPassRequest, AttendanceAnomaly, Trip
 from django.db import transaction
-from .schedule_utils import get_student_schedule_by_id
+from .schedule_utils import get_student_schedule_by_id, get_all_schedules
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
 
@@ -189,6 +189,85 @@ class StudentBusPassSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['admin_who_granted', 'used_at']
 
+class BulkBusPassSerializer(serializers.Serializer):
+    """
+    Grants the same pass window to a cohort. Exactly one target is given:
+    a list of university_ids, a schedule_id, or a course name from the
+    schedule data.
+    """
+    university_ids = serializers.ListField(child=serializers.CharField(), required=False, allow_empty=False)
+    schedule_id = serializers.CharField(required=False)
+    course = serializers.CharField(required=False)
+    reason = serializers.CharField(required=False, allow_blank=True, default='')
+    valid_from = serializers.DateTimeField()
+    valid_until = serializers.DateTimeField()
+
+    def validate(self, data):
+        targets = [key for key in ('university_ids', 'schedule_id', 'course') if key in data]
+        if len(targets) != 1:
+            raise serializers.ValidationError("Provide exactly one of university_ids, schedule_id or course.")
+
+        if data['valid_from'] >= data['valid_until']:
+            raise serializers.ValidationError("valid_from must be before valid_until.")
+
+        students = Student.objects.only('id', 'university_id')
+
+        if 'university_ids' in data:
+            requested_ids = set(data['university_ids'])
+            students = list(students.filter(university_id__in=requested_ids))
+            missing_ids = requested_ids - {student.university_id for student in students}
+            if missing_ids:
+                raise serializers.ValidationError({"university_ids": f"Unknown university ids: {', '.join(sorted(missing_ids))}"})
+        else:
+            all_schedules = get_all_schedules()
+            if 'schedule_id' in data:
+                if data['schedule_id'] not in all_schedules:
+                    raise serializers.ValidationError({"schedule_id": f"Schedule ID '{data['schedule_id']}' not found."})
+                schedule_ids = [data['schedule_id']]
+            else:
+                schedule_ids = [
+                    schedule_id for schedule_id, schedule_data in all_schedules.items()
+                    if str(schedule_data.get('course', '')).lower() == data['course'].lower()
+                ]
+                if not schedule_ids:
+                    raise serializers.ValidationError({"course": f"Course '{data['course']}' not found."})
+            students = list(students.filter(schedule_id__in=schedule_ids))
+
+        if not students:
+            raise serializers.ValidationError("No students match this target.")
+
+        data['students'] = students
+        return data
+
+class PassDecisionItemSerializer(serializers.Serializer):
+    ACTION_CHOICES = ['approve', 'reject']
+
+    id = serializers.IntegerField()
+    action = serializers.ChoiceField(choices=ACTION_CHOICES, required=False)
+    valid_from = serializers.DateTimeField(required=False)
+    valid_until = serializers.DateTimeField(required=False)
+    admin_notes = serializers.CharField(required=False, allow_blank=True)
+
+class BatchPassDecisionSerializer(serializers.Serializer):
+    """
+    A list of pass request decisions. The top-level action applies to every
+    item that does not set its own.
+    """
+    action = serializers.ChoiceField(choices=PassDecisionItemSerializer.ACTION_CHOICES, required=False)
+    items = PassDecisionItemSerializer(many=True, allow_empty=False)
+
+    def validate(self, data):
+        request_ids = [item['id'] for item in data['items']]
+        if len(request_ids) != len(set(request_ids)):
+            raise serializers.ValidationError("Each request id may only appear once.")
+
+        for item in data['items']:
+            item.setdefault('action', data.get('action'))
+            if not item['action']:
+                raise serializers.ValidationError(f"No action given for request {item['id']}.")
+
+        return data
+
 class AttendanceLogSerializer(serializers.ModelSerializer):
     student_id = serializers.CharField(source='student.university_id', read_only=True)
     student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
@@ -203,6 +282,20 @@ class AttendanceLogSerializer(serializers.ModelSerializer):
             'bus_number',
             'status',
             'direction',
+            'trip',
+        ]
+
+
+class TripSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Trip
+        fields = [
+            'id',
+            'bus_number',
+            'direction',
+            'started_at',
+            'ended_at',
+            'scan_count',
         ]
 
 
@@ -246,6 +339,43 @@ class BusPassRequestSerializer(serializers.ModelSerializer):
         return obj.student.university_id
     
 
+class AdminStudentListSerializer(serializers.ModelSerializer):
+    first_name = serializers.CharField(source='user.first_name', read_only=True, default='')
+    last_name = serializers.CharField(source='user.last_name', read_only=True, default='')
+    email = serializers.EmailField(source='user.email', read_only=True, default=None)
+    parent_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Student
+        fields = [
+            'id',
+            'university_id',
+            'first_name',
+            'last_name',
+            'email',
+            'schedule_id',
+            'parent_count',
+            'created_at'
+        ]
+
+class AdminParentListSerializer(serializers.ModelSerializer):
+    first_name = serializers.CharField(source='user.first_name', read_only=True)
+    last_name = serializers.CharField(source='user.last_name', read_only=True)
+    email = serializers.EmailField(source='user.email', read_only=True)
+    children_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Parent
+        fields = [
+            'id',
+            'first_name',
+            'last_name',
+            'email',
+            'phone_number',
+            'children_count',
+            'created_at'
+        ]
+
 class AdminStudentDetailSerializer(serializers.ModelSerializer):
    
     first_name = serializers.CharField(source='user.first_name', read_only=True)
@@ -317,4 +447,18 @@ class AdminParentDetailSerializer(serializers.ModelSerializer):
             }
             for child in children
         ]
-    
+
+class AttendanceAnomalySerializer(serializers.ModelSerializer):
+    student_id = serializers.CharField(source='student.university_id', read_only=True, default=None)
+
+    class Meta:
+        model = AttendanceAnomaly
+        fields = [
+            'id',
+            'kind',
+            'student_id',
+            'bus_number',
+            'date',
+            'details',
+            'detected_at'
+        ]
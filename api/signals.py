@@ -0,0 +1,90 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Student, Parent, StudentBusPass, BusReader, AttendanceLog, Schedule
+from .roster import record_roster_change
+from .readers import invalidate_reader_registry
+from .schedule_utils import invalidate_schedule_table
+from .search import build_student_search_text, build_parent_search_text, index_student, index_parent, unindex
+
+
+@receiver([post_save, post_delete], sender=Student)
+def student_roster_changed(sender, instance, **kwargs):
+    record_roster_change(instance.university_id)
+
+@receiver(post_delete, sender=Student)
+def student_attendance_logs_deleted(sender, instance, **kwargs):
+    # Logs may sit in another database, so they are not removed by a cascade.
+    AttendanceLog.objects.filter(student_id=instance.pk).delete()
+
+@receiver([post_save, post_delete], sender=StudentBusPass)
+def bus_pass_roster_changed(sender, instance, **kwargs):
+    # On a cascading student delete the student row is already gone; the
+    # Student receiver has recorded that change.
+    university_id = Student.objects.filter(pk=instance.student_id).values_list('university_id', flat=True).first()
+    record_roster_change(university_id)
+
+
+USER_SEARCH_FIELDS = ('first_name', 'last_name', 'email')
+
+def _set_search_text(instance, search_text):
+    # search_text as loaded is what other workers indexed; None if deferred.
+    previous = instance.__dict__.get('search_text')
+    instance.search_text = search_text
+    instance._search_text_changed = instance._state.adding or previous != search_text
+
+@receiver(pre_save, sender=Student)
+def student_search_text(sender, instance, **kwargs):
+    _set_search_text(instance, build_student_search_text(instance))
+
+@receiver(pre_save, sender=Parent)
+def parent_search_text(sender, instance, **kwargs):
+    _set_search_text(instance, build_parent_search_text(instance))
+
+@receiver(post_save, sender=Student)
+def student_search_index(sender, instance, **kwargs):
+    if instance._search_text_changed:
+        index_student(instance)
+
+@receiver(post_save, sender=Parent)
+def parent_search_index(sender, instance, **kwargs):
+    if instance._search_text_changed:
+        index_parent(instance)
+
+@receiver(post_delete, sender=Student)
+def student_search_unindex(sender, instance, **kwargs):
+    unindex('student', instance.pk)
+
+@receiver(post_delete, sender=Parent)
+def parent_search_unindex(sender, instance, **kwargs):
+    unindex('parent', instance.pk)
+
+@receiver(pre_save, sender=User)
+def user_search_fields_changed(sender, instance, update_fields=None, **kwargs):
+    # Logins save last_login alone; only real name or email edits reach the index.
+    if instance._state.adding or (update_fields is not None and not set(USER_SEARCH_FIELDS) & set(update_fields)):
+        instance._search_fields_changed = False
+        return
+    previous = User.objects.filter(pk=instance.pk).values_list(*USER_SEARCH_FIELDS).first()
+    instance._search_fields_changed = previous != tuple(getattr(instance, field) for field in USER_SEARCH_FIELDS)
+
+@receiver(post_save, sender=User)
+def user_search_changed(sender, instance, created, **kwargs):
+    # Names and emails live on User, so the linked profile's search data
+    # must follow edits made to the account.
+    if created or not instance._search_fields_changed:
+        return
+    for student in Student.objects.filter(user=instance).select_related('user'):
+        Student.objects.filter(pk=student.pk).update(search_text=build_student_search_text(student))
+        index_student(student)
+    for parent in Parent.objects.filter(user=instance).select_related('user'):
+        Parent.objects.filter(pk=parent.pk).update(search_text=build_parent_search_text(parent))
+        index_parent(parent)
+
+@receiver([post_save, post_delete], sender=BusReader)
+def bus_reader_changed(sender, instance, **kwargs):
+    invalidate_reader_registry()
+
+@receiver([post_save, post_delete], sender=Schedule)
+def schedule_changed(sender, instance, **kwargs):
+    invalidate_schedule_table()
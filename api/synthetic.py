@@ -0,0 +1,211 @@
+"""
+Synthetic data for scale testing: students spread across schedules,
+parents with several children, bus passes, pass requests and a realistic
+AttendanceLog history. Every value is drawn from random.Random seeded
+from the run seed (and the chunk number for logs), so a seed always
+produces the same data whatever the worker count.
+"""
+import csv
+import hashlib
+import io
+import random
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from django.contrib.auth.models import User
+from django.db import connections, router
+from django.utils import timezone
+from .models import AttendanceLog, BusPassRequest, Parent, Student, StudentBusPass
+from .search import build_parent_search_text, build_student_search_text
+
+FIRST_NAMES = ['Ana', 'Ben', 'Chloé', 'Dev', 'Elif', 'Farah', 'Gus', 'Hana', 'Iván', 'Jon', 'Kofi', 'Lena', 'Mika', 'Noor', 'Omar', 'Pia']
+LAST_NAMES = ['Abe', 'Brown', 'Costa', 'Dąbrowski', 'Evans', 'Fischer', 'García', 'Huang', 'Ivanov', 'Jones', 'Kim', 'López', 'Müller', 'Nair']
+
+UNUSABLE_PASSWORD = '!synthetic'
+
+
+@dataclass(frozen=True)
+class SyntheticScale:
+    students: int
+    parents: int
+    days: int
+    buses: int = 40
+    # Chance that a student rides on a given scheduled day (one inbound and
+    # one outbound scan), and on an unscheduled day (an INVALID or, with a
+    # pass, OVERRIDE scan).
+    ride_rate: float = 0.8
+    off_schedule_rate: float = 0.02
+    pass_rate: float = 0.05
+    request_rate: float = 0.1
+    claimed_rate: float = 0.6
+
+
+SCALE_PROFILES = {
+    'ci': SyntheticScale(students=500, parents=200, days=14, buses=5),
+    'small': SyntheticScale(students=5000, parents=2000, days=60, buses=10),
+    'large': SyntheticScale(students=100000, parents=40000, days=300),
+}
+
+
+def _registration_code(prefix, index):
+    return hashlib.sha1(f'{prefix}:{index}'.encode()).hexdigest()[:10].upper()
+
+def _name(rng):
+    return rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+
+
+def generate_people(scale, seed, prefix, day_masks, batch_size=5000):
+    """
+    Creates users, students, parents and their links. Returns
+    (student_id, schedule_id, home_bus) for every created student.
+    """
+    rng = random.Random(f'{seed}:people')
+    schedule_ids = sorted(day_masks, key=str)
+
+    student_users = []
+    students = []
+    for index in range(scale.students):
+        university_id = f'{prefix}{index:07d}'
+        user = None
+        if rng.random() < scale.claimed_rate:
+            first_name, last_name = _name(rng)
+            user = User(username=f'{university_id}@student.synthetic.test', email=f'{university_id}@student.synthetic.test',
+                        first_name=first_name, last_name=last_name, password=UNUSABLE_PASSWORD)
+            student_users.append(user)
+        students.append(Student(
+            university_id=university_id,
+            university_email=f'{university_id}@uni.synthetic.test',
+            registration_code=_registration_code(prefix, index),
+            schedule_id=rng.choice(schedule_ids),
+            user=user,
+        ))
+    User.objects.bulk_create(student_users, batch_size=batch_size)
+    for student in students:
+        # bulk_create skips the signal that fills search_text.
+        student.search_text = build_student_search_text(student)
+    Student.objects.bulk_create(students, batch_size=batch_size)
+
+    parent_users = []
+    parents = []
+    for index in range(scale.parents):
+        first_name, last_name = _name(rng)
+        username = f'{prefix}-parent-{index:07d}@synthetic.test'
+        user = User(username=username, email=username, first_name=first_name, last_name=last_name, password=UNUSABLE_PASSWORD)
+        parent_users.append(user)
+        parents.append(Parent(user=user, phone_number=f'+1555{rng.randrange(10 ** 7):07d}'))
+    User.objects.bulk_create(parent_users, batch_size=batch_size)
+    for parent in parents:
+        parent.search_text = build_parent_search_text(parent)
+    Parent.objects.bulk_create(parents, batch_size=batch_size)
+
+    # Most parents have one child, some have two or three.
+    student_pks = [student.pk for student in students]
+    links = [
+        Parent.children.through(parent_id=parent.pk, student_id=student_pk)
+        for parent in parents
+        for student_pk in rng.sample(student_pks, min(len(student_pks), rng.choices([1, 2, 3], weights=[6, 3, 1])[0]))
+    ]
+    Parent.children.through.objects.bulk_create(links, batch_size=batch_size)
+
+    return [(student.pk, student.schedule_id, rng.randrange(1, scale.buses + 1)) for student in students]
+
+
+def generate_passes_and_requests(scale, seed, student_rows, start_date, admin=None, batch_size=5000):
+    rng = random.Random(f'{seed}:passes')
+    tz = timezone.get_current_timezone()
+    passes = []
+    requests = []
+    for student_id, _, _ in student_rows:
+        if rng.random() < scale.pass_rate:
+            valid_from = timezone.make_aware(datetime.combine(start_date + timedelta(days=rng.randrange(scale.days)), time(6)), tz)
+            used = rng.random() < 0.7
+            passes.append(StudentBusPass(
+                student_id=student_id, admin_who_granted=admin, reason='Synthetic pass',
+                valid_from=valid_from, valid_until=valid_from + timedelta(hours=14),
+                used_at=valid_from + timedelta(hours=2) if used else None,
+            ))
+        if rng.random() < scale.request_rate:
+            requested_from = timezone.make_aware(datetime.combine(start_date + timedelta(days=rng.randrange(scale.days)), time(6)), tz)
+            request_status = rng.choices(BusPassRequest.RequestStatus.values, weights=[2, 5, 3])[0]
+            approved = request_status == BusPassRequest.RequestStatus.APPROVED
+            requests.append(BusPassRequest(
+                student_id=student_id, status=request_status, reason='Synthetic request',
+                requested_valid_from=requested_from, requested_valid_until=requested_from + timedelta(hours=14),
+                approved_valid_from=requested_from if approved else None,
+                approved_valid_until=requested_from + timedelta(hours=14) if approved else None,
+            ))
+    StudentBusPass.objects.bulk_create(passes, batch_size=batch_size)
+    BusPassRequest.objects.bulk_create(requests, batch_size=batch_size)
+    return len(passes), len(requests)
+
+
+def _scan_time(rng, day, direction, tz):
+    if direction == AttendanceLog.BusDirection.INBOUND:
+        minutes = rng.triangular(7 * 60, 10 * 60, 8 * 60)
+    else:
+        minutes = rng.triangular(14 * 60, 19 * 60, 16 * 60 + 30)
+    return timezone.make_aware(datetime.combine(day, time.min), tz) + timedelta(minutes=minutes, seconds=rng.randrange(60))
+
+def _log_rows(scale, seed, chunk_index, student_rows, start_date, day_masks):
+    rng = random.Random(f'{seed}:logs:{chunk_index}')
+    tz = timezone.get_current_timezone()
+    days = [start_date + timedelta(days=offset) for offset in range(scale.days)]
+    for student_id, schedule_id, home_bus in student_rows:
+        mask = day_masks.get(schedule_id, 0)
+        for day in days:
+            scheduled = mask >> day.weekday() & 1
+            if scheduled:
+                if rng.random() >= scale.ride_rate:
+                    continue
+                status = AttendanceLog.ScanStatus.VALID
+            else:
+                if rng.random() >= scale.off_schedule_rate:
+                    continue
+                status = AttendanceLog.ScanStatus.OVERRIDE if rng.random() < 0.3 else AttendanceLog.ScanStatus.INVALID
+            for direction in AttendanceLog.BusDirection.values:
+                bus = home_bus if rng.random() < 0.95 else rng.randrange(1, scale.buses + 1)
+                yield student_id, _scan_time(rng, day, direction, tz), direction, str(bus), status
+                if status != AttendanceLog.ScanStatus.VALID:
+                    break
+
+def _copy_logs(connection, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    count = 0
+    for student_id, timestamp, direction, bus_number, status in rows:
+        writer.writerow((student_id, timestamp.isoformat(), direction, bus_number, status))
+        count += 1
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {AttendanceLog._meta.db_table} (student_id, timestamp, direction, bus_number, status) FROM STDIN WITH (FORMAT csv)',
+            buffer,
+        )
+    return count
+
+def generate_log_chunk(scale, seed, chunk_index, student_rows, start_date, day_masks, batch_size=10000):
+    """
+    Writes the scan history of one slice of students, with COPY on Postgres
+    and bulk_create elsewhere. Safe to run in parallel worker processes.
+    Returns the number of rows written.
+    """
+    alias = router.db_for_write(AttendanceLog)
+    connection = connections[alias]
+    rows = _log_rows(scale, seed, chunk_index, student_rows, start_date, day_masks)
+    if connection.vendor == 'postgresql':
+        return _copy_logs(connection, rows)
+
+    batch = []
+    count = 0
+    for student_id, timestamp, direction, bus_number, status in rows:
+        batch.append(AttendanceLog(student_id=student_id, timestamp=timestamp, direction=direction, bus_number=bus_number, status=status))
+        if len(batch) >= batch_size:
+            AttendanceLog.objects.using(alias).bulk_create(batch)
+            count += len(batch)
+            batch = []
+    AttendanceLog.objects.using(alias).bulk_create(batch)
+    return count + len(batch)
+
+
+def init_worker():
+    import django
+    django.setup()
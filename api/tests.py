@@ -1,3 +1,493 @@
-from django.test import TestCase
+import shutil
+import tempfile
+import threading
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from . import archive, db_routers, schedule_utils
+from .archive import archive_month, read_archived_logs, set_archive_cutoff
+from .models import AttendanceLog, RosterChange, Schedule, Student, StudentBusPass, Trip
+from .renderers import FastJSONRenderer, FloatJSONRenderer
+from .ridership import RidershipCounters
+from .schedule_utils import compile_schedules, get_day_mask, is_scheduled_at, parse_time_window
+from .trips import clear_trips, rebuild_trip_chunk, record_trip_scan
 
-# Create your tests here.
+
+@skipUnless(connection.vendor == 'postgresql', "SQLite serialises writers, so the threads only see 'database is locked'.")
+@override_settings(BUS_API_KEY='test-bus-key')
+class ConcurrentPassConsumptionTests(TransactionTestCase):
+    """
+    Several readers scanning one student at the same moment must consume
+    the student's single pass exactly once. Needs a database with real
+    concurrent transactions (Postgres); each thread uses its own connection.
+    """
+    THREADS = 8
+
+    def setUp(self):
+        # A schedule that never runs, so only the pass can make a scan valid.
+        Schedule.objects.create(schedule_id='NONE', course='Test', day_mask=0)
+        self.student = Student.objects.create(
+            university_id='2000001', university_email='2000001@uni.test', registration_code='PASSTEST', schedule_id='NONE'
+        )
+        now = timezone.now()
+        StudentBusPass.objects.create(student=self.student, valid_from=now - timedelta(hours=1), valid_until=now + timedelta(hours=1))
+
+    def test_single_pass_is_consumed_exactly_once(self):
+        barrier = threading.Barrier(self.THREADS)
+        results = []
+        errors = []
+
+        def scan(bus_number):
+            try:
+                client = Client()
+                barrier.wait()
+                response = client.post(
+                    '/api/logs/scan/',
+                    {'student_rfid': self.student.university_id, 'bus_number': bus_number, 'scan_timestamp': timezone.now().isoformat()},
+                    content_type='application/json',
+                    HTTP_X_API_KEY='test-bus-key',
+                )
+                results.append((response.status_code, response.json().get('reason')))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=scan, args=(str(i),)) for i in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), self.THREADS)
+        self.assertEqual(sum(1 for result in results if result == (200, 'Admin Pass Used')), 1)
+        self.assertEqual(sum(1 for result in results if result == (403, 'Not on Schedule')), self.THREADS - 1)
+        self.assertEqual(AttendanceLog.objects.filter(status=AttendanceLog.ScanStatus.OVERRIDE).count(), 1)
+        self.assertEqual(AttendanceLog.objects.filter(status=AttendanceLog.ScanStatus.INVALID).count(), self.THREADS - 1)
+        self.assertEqual(StudentBusPass.objects.filter(used_at__isnull=False).count(), 1)
+
+
+REPLICA_CONFIGURED = 'replica' in settings.DATABASES
+
+
+@skipUnless(REPLICA_CONFIGURED, "Set POSTGRES_REPLICA_HOST (the primary's host will do) to run the replica routing tests.")
+class ReportingReplicaRoutingTests(TransactionTestCase):
+    """
+    Runs against two database aliases: 'replica' is a TEST MIRROR of
+    'default', a separate connection to the same test database, so which
+    alias served a query shows up in that connection's captured queries.
+    Transactional so rows written on 'default' are visible to 'replica'.
+    """
+    # Declaring an alias that is not configured breaks the runner even for a skipped class.
+    databases = {'default', 'replica'} if REPLICA_CONFIGURED else {'default'}
+    list_url = '/api/admin/students/'
+
+    def setUp(self):
+        db_routers._lag_checked_at = None
+        self.admin = User.objects.create_superuser('admin', 'admin@uni.test', 'password')
+        self.student = Student.objects.create(university_id='2000002', university_email='2000002@uni.test', registration_code='ROUTETEST')
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def tearDown(self):
+        db_routers._lag_checked_at = None
+
+    def _list_students(self):
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(replica_queries)
+
+    def test_reporting_reads_use_replica(self):
+        response, replica_queries = self._list_students()
+        self.assertGreater(replica_queries, 0)
+        self.assertEqual(response.json()['results'][0]['university_id'], '2000002')
+
+    def test_writes_stay_on_primary_and_pin_the_user(self):
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            response = self._grant_pass(self.client)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(replica_queries), 0)
+        self.assertIn(db_routers.PRIMARY_PIN_COOKIE, response.cookies)
+
+        # The pin travels with the client, so any worker honours it.
+        _, replica_queries = self._list_students()
+        self.assertEqual(replica_queries, 0)
+
+    def _grant_pass(self, client):
+        now = timezone.now()
+        return client.post('/api/admin/bus-pass/create/', {
+            'student': self.student.university_id,
+            'reason': 'Routing test',
+            'valid_from': now.isoformat(),
+            'valid_until': (now + timedelta(hours=1)).isoformat(),
+        }, content_type='application/json')
+
+    def test_pin_of_another_user_is_ignored(self):
+        other_client = Client()
+        other_client.force_login(User.objects.create_superuser('other', 'other@uni.test', 'password'))
+        response = self._grant_pass(other_client)
+        self.client.cookies[db_routers.PRIMARY_PIN_COOKIE] = response.cookies[db_routers.PRIMARY_PIN_COOKIE].value
+
+        _, replica_queries = self._list_students()
+        self.assertGreater(replica_queries, 0)
+
+    @override_settings(REPLICA_PIN_SECONDS=0)
+    def test_expired_pin_is_ignored(self):
+        self.assertIn(db_routers.PRIMARY_PIN_COOKIE, self._grant_pass(self.client).cookies)
+        _, replica_queries = self._list_students()
+        self.assertGreater(replica_queries, 0)
+
+    @override_settings(REPLICA_MAX_LAG_SECONDS=-1)
+    def test_lagging_replica_falls_back_to_primary(self):
+        _, replica_queries = self._list_students()
+        # Only the lag probe reached the replica.
+        self.assertEqual(replica_queries, 1)
+
+    def test_unreachable_replica_falls_back_to_primary(self):
+        with mock.patch.object(connections['replica'], 'cursor', side_effect=OperationalError("replica down")):
+            response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['university_id'], '2000002')
+
+
+class PrimaryPinningTests(TestCase):
+    """Only requests that actually write pin the user; routing a model for write is not a write."""
+    databases = {'default', 'replica'} if REPLICA_CONFIGURED else {'default'}
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@uni.test', 'password')
+        self.student = Student.objects.create(university_id='2000003', university_email='2000003@uni.test', registration_code='PINTEST')
+        self.client.force_login(self.admin)
+        # Make the report poll the schedule table version, which is read from the primary.
+        schedule_utils.schedule_table_version._version = None
+
+    def test_read_only_report_does_not_pin(self):
+        response = self.client.get('/api/admin/student-report/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(db_routers.PRIMARY_PIN_COOKIE, response.cookies)
+
+    def test_write_pins(self):
+        now = timezone.now()
+        response = self.client.post('/api/admin/bus-pass/create/', {
+            'student': self.student.university_id,
+            'valid_from': now.isoformat(),
+            'valid_until': (now + timedelta(hours=1)).isoformat(),
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(db_routers.PRIMARY_PIN_COOKIE, response.cookies)
+
+
+@override_settings(BUS_API_KEY='test-bus-key', ROSTER_SETTLE_SECONDS=0)
+class ReaderRosterDeltaTests(TestCase):
+    def setUp(self):
+        schedule_utils.invalidate_schedule_table()
+        Schedule.objects.create(schedule_id='MWF', course='Test', day_mask=0b0010101)
+        self.kept = Student.objects.create(university_id='2000004', university_email='2000004@uni.test', registration_code='KEEP', schedule_id='MWF')
+        self.changed = Student.objects.create(university_id='2000005', university_email='2000005@uni.test', registration_code='CHANGE')
+        self.snapshot = self._get('/api/readers/roster/')
+
+    def _get(self, url, status_code=200):
+        response = self.client.get(url, HTTP_X_API_KEY='test-bus-key')
+        self.assertEqual(response.status_code, status_code)
+        return response.json()
+
+    def _delta(self, since, schedule_version=None, status_code=200):
+        url = f'/api/readers/roster/delta/?since={since}'
+        if schedule_version is not None:
+            url += f'&schedule_version={schedule_version}'
+        return self._get(url, status_code)
+
+    def test_snapshot_lists_students_and_schedules(self):
+        self.assertEqual([entry[0] for entry in self.snapshot['students']], ['2000004', '2000005'])
+        self.assertEqual(self.snapshot['schedules']['MWF'], 0b0010101)
+
+    def test_delta_sends_only_students_changed_since(self):
+        self.changed.schedule_id = 'MWF'
+        self.changed.save()
+        delta = self._delta(self.snapshot['version'], self.snapshot['schedule_version'])
+        self.assertEqual(delta['students'], [['2000005', 'MWF', []]])
+        self.assertEqual(delta['removed'], [])
+        self.assertGreater(delta['version'], self.snapshot['version'])
+
+        self.assertEqual(self._delta(delta['version'], self.snapshot['schedule_version'])['students'], [])
+
+    def test_deleted_student_is_removed(self):
+        self.changed.delete()
+        delta = self._delta(self.snapshot['version'], self.snapshot['schedule_version'])
+        self.assertEqual(delta['students'], [])
+        self.assertEqual(delta['removed'], ['2000005'])
+
+    def test_schedules_are_resent_only_when_their_hash_changes(self):
+        delta = self._delta(self.snapshot['version'], self.snapshot['schedule_version'])
+        self.assertNotIn('schedules', delta)
+
+        Schedule.objects.filter(schedule_id='MWF').update(day_mask=0b0000001)
+        schedule_utils.invalidate_schedule_table()
+        delta = self._delta(self.snapshot['version'], self.snapshot['schedule_version'])
+        self.assertEqual(delta['schedules']['MWF'], 0b0000001)
+        self.assertNotEqual(delta['schedule_version'], self.snapshot['schedule_version'])
+
+    def test_unsettled_changes_are_sent_again(self):
+        with self.settings(ROSTER_SETTLE_SECONDS=60):
+            self.changed.save()
+            delta = self._delta(self.snapshot['version'])
+        self.assertEqual(delta['version'], 0)
+        self.assertIn('2000005', [entry[0] for entry in delta['students']])
+
+    def test_since_must_be_a_number(self):
+        self._delta('latest', status_code=400)
+
+    def test_pruned_versions_require_a_snapshot(self):
+        self.changed.save()
+        RosterChange.objects.update(changed_at=timezone.now() - timedelta(days=settings.ROSTER_CHANGE_RETENTION_DAYS + 1))
+        call_command('prune_roster_changes', stdout=StringIO())
+
+        self.assertTrue(self._delta(0, status_code=410)['snapshot_required'])
+        self.assertEqual(self._delta(self._get('/api/readers/roster/')['version'])['students'], [])
+
+
+class AttendanceArchiveTests(TestCase):
+    """Round trips logs through api.archive in a temporary archive root."""
+    MONTH = date(2026, 1, 1)
+
+    def setUp(self):
+        archive_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_root)
+        archive_settings = override_settings(ATTENDANCE_ARCHIVE_ROOT=archive_root)
+        archive_settings.enable()
+        self.addCleanup(archive_settings.disable)
+
+        self.first = Student.objects.create(university_id='2000006', university_email='2000006@uni.test', registration_code='ARCH1')
+        self.second = Student.objects.create(university_id='2000007', university_email='2000007@uni.test', registration_code='ARCH2')
+        self.first_logs = [self._log(self.first.id, 5), self._log(self.first.id, 6)]
+        self.second_logs = [self._log(self.second.id, 7)]
+
+    def _log(self, student_id, day):
+        return AttendanceLog.objects.create(
+            student_id=student_id,
+            timestamp=timezone.make_aware(datetime(2026, 1, day, 8)),
+            bus_number='12',
+            status=AttendanceLog.ScanStatus.VALID,
+        )
+
+    def _archive(self):
+        tz = timezone.get_current_timezone()
+        start = timezone.make_aware(datetime(2026, 1, 1), tz)
+        end = timezone.make_aware(datetime(2026, 2, 1), tz)
+        archived = archive_month(self.MONTH, start, end)
+        set_archive_cutoff(date(2026, 2, 1))
+        return archived
+
+    def _read(self, university_id=None, from_date=date(2026, 1, 1), to_date=date(2026, 1, 31)):
+        return [record['id'] for record in read_archived_logs(from_date, to_date, university_id)]
+
+    def test_round_trip_reads_each_member_by_offset(self):
+        self.assertEqual(self._archive(), 3)
+
+        index = archive._load_index(self.MONTH)
+        spans = sorted(index.values())
+        self.assertEqual(spans[0][0], 0)
+        self.assertEqual(spans[1][0], spans[0][0] + spans[0][1])
+
+        self.assertEqual(self._read('2000006'), [log.id for log in reversed(self.first_logs)])
+        self.assertEqual(self._read('2000007'), [self.second_logs[0].id])
+        self.assertEqual(self._read(), [self.second_logs[0].id] + [log.id for log in reversed(self.first_logs)])
+        self.assertEqual(self._read('2000006', from_date=date(2026, 1, 6)), [self.first_logs[1].id])
+        self.assertEqual(self._read('2000008'), [])
+
+    def test_rearchiving_merges_without_duplicates(self):
+        self._archive()
+        late_log = self._log(self.first.id, 20)
+
+        self.assertEqual(self._archive(), 1)
+        self.assertEqual(self._read('2000006'), [late_log.id] + [log.id for log in reversed(self.first_logs)])
+        # The member without new rows is copied across unchanged.
+        self.assertEqual(self._read('2000007'), [self.second_logs[0].id])
+
+    def test_logs_of_deleted_students_are_kept_apart(self):
+        orphan_log = self._log(999999, 9)
+        self._archive()
+
+        self.assertIn(archive.ORPHAN_MEMBER_KEY.format(999999), archive._load_index(self.MONTH))
+        self.assertIn(orphan_log.id, self._read())
+
+
+class CompiledScheduleTests(TestCase):
+    # 2026-01-05 is a Monday.
+    MONDAY = datetime(2026, 1, 5, 9, 0)
+
+    def _compile(self, days, windows=None):
+        return compile_schedules([('S1', 'Test', '1', get_day_mask(days), windows)]).schedules['S1']
+
+    def _at(self, days_after_monday, hour=9, minute=0, tz=dt_timezone.utc):
+        return (self.MONDAY + timedelta(days=days_after_monday)).replace(hour=hour, minute=minute, tzinfo=tz)
+
+    def test_day_mask_bits_follow_weekday(self):
+        self.assertEqual(get_day_mask(['Mo', 'We', 'Su']), 0b1000101)
+        self.assertEqual(get_day_mask(['monday', 'xx']), 0b0000001)
+
+    def test_weekday_bitmask_allows_and_denies(self):
+        schedule = self._compile(['Mo', 'We', 'Fr'])
+        allowed = [schedule.allows(self._at(day)) for day in range(7)]
+        self.assertEqual(allowed, [True, False, True, False, True, False, False])
+
+    def test_time_windows_are_end_exclusive(self):
+        schedule = self._compile(['Mo'], ['07:00-10:00', '14:00-18:00'])
+        self.assertTrue(schedule.allows(self._at(0, 7, 0)))
+        self.assertTrue(schedule.allows(self._at(0, 9, 59)))
+        self.assertFalse(schedule.allows(self._at(0, 10, 0)))
+        self.assertFalse(schedule.allows(self._at(0, 6, 59)))
+        self.assertTrue(schedule.allows(self._at(0, 14, 30)))
+        self.assertFalse(schedule.allows(self._at(1, 8, 0)))
+
+    @override_settings(TIME_ZONE='Asia/Tokyo')
+    def test_weekday_is_taken_in_project_time_zone(self):
+        schedule = self._compile(['Tu'])
+        # Monday 20:00 UTC is Tuesday 05:00 in Tokyo.
+        self.assertTrue(schedule.allows(self._at(0, 20)))
+        self.assertFalse(schedule.allows(self._at(1, 20)))
+
+    def test_is_scheduled_at_reads_the_stored_schedules(self):
+        schedule_utils.invalidate_schedule_table()
+        Schedule.objects.create(schedule_id='WKND', course='Test', day_mask=get_day_mask(['Sa', 'Su']))
+        self.assertTrue(is_scheduled_at('WKND', self._at(5)))
+        self.assertFalse(is_scheduled_at('WKND', self._at(0)))
+        self.assertFalse(is_scheduled_at(None, self._at(5)))
+        with self.assertRaises(Exception):
+            is_scheduled_at('MISSING', self._at(0))
+
+    def test_invalid_time_windows_are_rejected(self):
+        for window in ('10:00-07:00', '07:60-08:00', '07:00-24:01'):
+            with self.subTest(window=window), self.assertRaises(ValueError):
+                parse_time_window(window)
+
+
+@override_settings(TRIP_GAP_MINUTES=20)
+class TripSegmentationTests(TestCase):
+    INBOUND = AttendanceLog.BusDirection.INBOUND
+
+    def setUp(self):
+        self.student = Student.objects.create(university_id='2000009', university_email='2000009@uni.test', registration_code='TRIPS')
+
+    def _at(self, hour, minute, second=0):
+        return timezone.make_aware(datetime(2026, 1, 5, hour, minute, second))
+
+    def _scan(self, hour, minute, second=0, bus_number='12', direction=INBOUND):
+        timestamp = self._at(hour, minute, second)
+        return AttendanceLog.objects.create(
+            student=self.student, timestamp=timestamp, bus_number=bus_number, direction=direction,
+            status=AttendanceLog.ScanStatus.VALID, trip=record_trip_scan(bus_number, direction, timestamp),
+        )
+
+    def _trips(self):
+        return list(Trip.objects.order_by('bus_number', 'direction', 'started_at').values_list('bus_number', 'direction', 'started_at', 'ended_at', 'scan_count'))
+
+    def test_scans_within_the_gap_share_a_trip(self):
+        first = self._scan(8, 0)
+        # Exactly the gap still continues the trip; one second more starts a new one.
+        second = self._scan(8, 20)
+        third = self._scan(8, 40, 1)
+        self.assertEqual(first.trip_id, second.trip_id)
+        self.assertNotEqual(second.trip_id, third.trip_id)
+        self.assertEqual(self._trips(), [
+            ('12', self.INBOUND, self._at(8, 0), self._at(8, 20), 2),
+            ('12', self.INBOUND, self._at(8, 40, 1), self._at(8, 40, 1), 1),
+        ])
+
+    def test_other_bus_or_direction_starts_its_own_trip(self):
+        trips = {self._scan(8, 0).trip_id, self._scan(8, 1, bus_number='14').trip_id, self._scan(8, 2, direction=AttendanceLog.BusDirection.OUTBOUND).trip_id}
+        self.assertEqual(len(trips), 3)
+        self.assertIsNone(record_trip_scan('', self.INBOUND, self._at(8, 3)))
+
+    def test_late_scan_bridging_two_trips_merges_them(self):
+        early = self._scan(8, 0)
+        late = self._scan(8, 30)
+        self.assertNotEqual(early.trip_id, late.trip_id)
+
+        bridge = self._scan(8, 15)
+        self.assertEqual(self._trips(), [('12', self.INBOUND, self._at(8, 0), self._at(8, 30), 3)])
+        self.assertEqual(set(AttendanceLog.objects.values_list('trip_id', flat=True)), {bridge.trip_id})
+
+    def test_rebuild_across_chunks_matches_live_segmentation(self):
+        for minute in (0, 10, 30, 50):
+            self._scan(8, minute)
+        self._scan(9, 50)
+        live_trips = self._trips()
+        self.assertEqual([trip[4] for trip in live_trips], [4, 1])
+
+        start = clear_trips()
+        self.assertEqual(Trip.objects.count(), 0)
+        open_trips = {}
+        # The chunk boundary falls inside the first trip.
+        self.assertEqual(rebuild_trip_chunk(start, self._at(8, 20), open_trips), (1, 2))
+        self.assertEqual(rebuild_trip_chunk(self._at(8, 20), self._at(10, 0), open_trips), (1, 3))
+
+        self.assertEqual(self._trips(), live_trips)
+        first_trip = Trip.objects.get(started_at=self._at(8, 0))
+        self.assertEqual(AttendanceLog.objects.filter(trip=first_trip).count(), 4)
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    def assertRendersLikeDRF(self, renderer, data):
+        self.assertEqual(renderer.render(data), JSONRenderer().render(data))
+
+    def test_dates_and_times_render_like_drf(self):
+        self.assertRendersLikeDRF(FastJSONRenderer(), {
+            'datetime': datetime(2026, 1, 5, 8, 30, 1, 123456, tzinfo=dt_timezone.utc),
+            'naive': datetime(2026, 1, 5, 8, 30, 1, 123456),
+            'date': date(2026, 1, 5),
+            'time': time(8, 30, 1, 123456),
+            'whole_second': time(8, 30),
+        })
+
+    def test_plain_payload_renders_like_drf(self):
+        self.assertRendersLikeDRF(FastJSONRenderer(), {
+            'results': [{'id': 1, 'name': 'Zo\u00eb\u2028', 'active': True, 'bus': None}],
+            'count': 1,
+            'total': Decimal('12.5'),
+        })
+
+    def test_float_renderer_matches_drf_for_exponent_floats(self):
+        for value in (1e16, 1e-5, -2.5e20, 0.0001, 0.0, 12.25):
+            with self.subTest(value=value):
+                self.assertRendersLikeDRF(FloatJSONRenderer(), {'rows': [{'rate': value}]})
+
+    def test_float_renderer_rejects_non_finite_floats_like_drf(self):
+        with self.assertRaises(ValueError):
+            FloatJSONRenderer().render({'rate': float('nan')})
+
+
+class RidershipCountersTests(TestCase):
+    def setUp(self):
+        self.student = Student.objects.create(university_id='2000010', university_email='2000010@uni.test', registration_code='RIDE')
+        self.now = timezone.now()
+
+    def _log(self):
+        return AttendanceLog.objects.create(student=self.student, timestamp=self.now, bus_number='12', status=AttendanceLog.ScanStatus.VALID)
+
+    def _event(self, log):
+        return {'id': log.id, 'timestamp': self.now.isoformat(), 'bus_number': '12', 'direction': log.direction, 'status': log.status}
+
+    def test_events_count_scans_missing_from_the_load_once(self):
+        late, loaded = self._log(), self._log()
+        # Stands in for a scan whose lower id committed after the load.
+        AttendanceLog.objects.filter(pk=late.pk).delete()
+        counters = RidershipCounters(60)
+        counters.snapshot(60)
+
+        counters.record_event(self._event(late))
+        counters.record_event(self._event(loaded))
+        today, recent = counters.snapshot(60)
+        self.assertEqual(today['12'][(AttendanceLog.BusDirection.INBOUND, AttendanceLog.ScanStatus.VALID)], 2)
+        self.assertEqual(sum(recent['12'].values()), 2)
@@ -0,0 +1,129 @@
+import hashlib
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+MAX_LOCAL_BUCKETS = 10000
+
+
+class LocalBucketStore:
+    """
+    Token buckets kept in this process's memory. A check is a dict lookup
+    and a little arithmetic under a lock, with no I/O at all.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def take(self, key, capacity, refill_rate, now):
+        with self._lock:
+            tokens, updated_at, _ = self._buckets.get(key, (capacity, now, None))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            # Each bucket keeps its own refill time: scopes have different rates.
+            self._buckets[key] = (tokens, now, capacity / refill_rate)
+            if len(self._buckets) > MAX_LOCAL_BUCKETS:
+                self._prune(now)
+            return allowed, tokens
+
+    def _prune(self, now):
+        # A bucket idle long enough to refill completely carries no state.
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items()
+            if now - bucket[1] < bucket[2]
+        }
+
+
+class CacheBucketStore:
+    """
+    Buckets in the shared Django cache so all workers enforce one limit.
+    The read-modify-write is not atomic; under a race a client may get a
+    token or two extra, which is acceptable for load shedding.
+    """
+
+    def take(self, key, capacity, refill_rate, now):
+        tokens, updated_at = cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        cache.set(key, (tokens, now), int(capacity / refill_rate) + 1)
+        return allowed, tokens
+
+
+_local_store = LocalBucketStore()
+
+def get_bucket_store():
+    if getattr(settings, 'THROTTLE_BUCKET_STORE', 'local') == 'cache':
+        return CacheBucketStore()
+    return _local_store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket throttle. The rate comes from DEFAULT_THROTTLE_RATES under
+    the view's throttle_scope, in DRF's "<n>/<period>" format: a burst of n
+    requests, refilled at n per period. Subclasses choose the identity.
+    """
+    timer = time.monotonic
+
+    def get_identity(self, request):
+        raise NotImplementedError('.get_identity() must be overridden')
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, 'throttle_scope', None)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope) if self.scope else None
+        if rate is None:
+            return True
+
+        self.capacity, self.period = self.parse_rate(rate)
+        self.refill_rate = self.capacity / self.period
+
+        key = f"throttle_{self.scope}_{self.get_identity(request)}"
+        allowed, self.tokens = get_bucket_store().take(key, self.capacity, self.refill_rate, self.timer())
+        return allowed
+
+    def parse_rate(self, rate):
+        num, period = rate.split('/')
+        duration = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+        return int(num), duration
+
+    def wait(self):
+        return max(0.0, (1 - self.tokens) / self.refill_rate)
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    def get_identity(self, request):
+        return f"ip_{self.get_ident(request)}"
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    def get_identity(self, request):
+        if request.user and request.user.is_authenticated:
+            return f"user_{request.user.pk}"
+        return f"ip_{self.get_ident(request)}"
+
+
+class APIKeyTokenBucketThrottle(TokenBucketThrottle):
+    """
+    One bucket per registered bus reader, told apart by its key. Readers
+    still on the legacy shared BUS_API_KEY all send the same key and can
+    claim any bus_number, so they get one bucket per key and IP; per-bus
+    limits need a registered BusReader.
+    """
+
+    def get_identity(self, request):
+        reader = getattr(request, 'bus_reader', None)
+        if reader:
+            return f"reader_{reader.id}"
+        api_key = request.headers.get('X-API-Key')
+        if not api_key:
+            return f"ip_{self.get_ident(request)}"
+        key_hash = hashlib.sha256(api_key.encode()).hexdigest()[:16]
+        return f"key_{key_hash}_ip_{self.get_ident(request)}"
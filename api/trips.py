@@ -0,0 +1,140 @@
+"""
+Trip segmentation of the scan log. A trip is a run of scans on one bus in
+one direction with no gap longer than TRIP_GAP_MINUTES. Each AttendanceLog
+points at its trip, so trip questions are answered from the Trip table
+instead of regrouping raw scans.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Min, OuterRef, Subquery
+from .models import AttendanceLog, Trip
+
+
+def get_trip_gap():
+    return timedelta(minutes=settings.TRIP_GAP_MINUTES)
+
+def _trip_scans(queryset):
+    return queryset.filter(bus_number__isnull=False).exclude(bus_number='')
+
+def _lock_bus(using, bus_number, direction):
+    # Serialises trip upkeep per bus and direction so two scans arriving
+    # together cannot each open a trip. Held until the transaction ends.
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [f'trip:{bus_number}:{direction}'])
+
+
+def record_trip_scan(bus_number, direction, timestamp):
+    """
+    Returns the trip a new scan belongs to, extended to cover it: an open
+    trip within the gap, or a new one. A late scan that closes the gap
+    between two trips merges them. Call inside a transaction on the log
+    database. Scans without a bus number have no trip.
+    """
+    if not bus_number:
+        return None
+
+    using = router.db_for_write(Trip)
+    gap = get_trip_gap()
+    _lock_bus(using, bus_number, direction)
+
+    trips = list(Trip.objects.using(using).filter(
+        bus_number=bus_number,
+        direction=direction,
+        started_at__lte=timestamp + gap,
+        ended_at__gte=timestamp - gap,
+    ).order_by('started_at'))
+
+    if not trips:
+        return Trip.objects.using(using).create(
+            bus_number=bus_number, direction=direction, started_at=timestamp, ended_at=timestamp, scan_count=1
+        )
+
+    trip, merged = trips[0], trips[1:]
+    if merged:
+        AttendanceLog.objects.using(using).filter(trip__in=merged).update(trip=trip)
+        trip.scan_count += sum(other.scan_count for other in merged)
+        trip.ended_at = max(other.ended_at for other in trips)
+        Trip.objects.using(using).filter(pk__in=[other.pk for other in merged]).delete()
+
+    trip.started_at = min(trip.started_at, timestamp)
+    trip.ended_at = max(trip.ended_at, timestamp)
+    trip.scan_count += 1
+    trip.save(update_fields=['started_at', 'ended_at', 'scan_count'])
+    return trip
+
+
+def clear_trips(since=None):
+    """
+    Detaches logs from the trips that end at or after `since` (all trips
+    when None) and deletes those trips. A trip that straddles `since` is
+    cleared whole, so the returned start, from which trips must be
+    rebuilt, can be earlier than `since`. Returns None when there are no
+    logs to rebuild.
+    """
+    using = router.db_for_write(Trip)
+    start = since
+    if start is None:
+        start = AttendanceLog.objects.using(using).order_by('timestamp').values_list('timestamp', flat=True).first()
+        if start is None:
+            Trip.objects.using(using).all().delete()
+            return None
+    while True:
+        earlier = Trip.objects.using(using).filter(ended_at__gte=start, started_at__lt=start).aggregate(Min('started_at'))
+        if earlier['started_at__min'] is None:
+            break
+        start = earlier['started_at__min']
+
+    with transaction.atomic(using=using):
+        AttendanceLog.objects.using(using).filter(timestamp__gte=start, trip__isnull=False).update(trip=None)
+        Trip.objects.using(using).filter(ended_at__gte=start).delete()
+    return start
+
+
+def rebuild_trip_chunk(start, end, open_trips):
+    """
+    Segments the logs in [start, end) into trips and links each log to its
+    trip. open_trips maps (bus_number, direction) to the latest trip of
+    earlier chunks, so a trip can run across chunk boundaries; it is updated
+    in place. Chunks must be processed in time order. Returns
+    (trips created, logs linked).
+    """
+    using = router.db_for_write(Trip)
+    gap = get_trip_gap()
+    logs = _trip_scans(AttendanceLog.objects.using(using).filter(timestamp__gte=start, timestamp__lt=end))
+
+    created = []
+    extended = {}
+    scans = 0
+    for bus_number, direction, timestamp in logs.order_by('timestamp').values_list('bus_number', 'direction', 'timestamp').iterator(chunk_size=5000):
+        key = (bus_number, direction)
+        trip = open_trips.get(key)
+        if trip is None or timestamp - trip.ended_at > gap:
+            trip = Trip(bus_number=bus_number, direction=direction, started_at=timestamp, ended_at=timestamp, scan_count=0)
+            open_trips[key] = trip
+            created.append(trip)
+        elif trip.pk is not None:
+            extended[trip.pk] = trip
+        trip.ended_at = timestamp
+        trip.scan_count += 1
+        scans += 1
+
+    with transaction.atomic(using=using):
+        Trip.objects.using(using).bulk_create(created, batch_size=1000)
+        Trip.objects.using(using).bulk_update(extended.values(), ['ended_at', 'scan_count'], batch_size=1000)
+        # One correlated UPDATE per chunk rather than one per trip.
+        logs.update(trip=Subquery(
+            Trip.objects.filter(
+                bus_number=OuterRef('bus_number'),
+                direction=OuterRef('direction'),
+                started_at__lte=OuterRef('timestamp'),
+                ended_at__gte=OuterRef('timestamp'),
+            ).values('pk')[:1]
+        ))
+
+    for key, trip in list(open_trips.items()):
+        if end - trip.ended_at > gap:
+            del open_trips[key]
+    return len(created), scans
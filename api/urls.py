@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import ParentRegistrationView, ParentProfileView, DemoStudentLoginView, StudentProfileView, StudentScheduleView, ScanLogView, CreateBusPassView, AdminScanLogView, StudentScheduleReportView, ParentChildrenListView, LinkChildView, ParentChildLogView, CustomTokenObtainPairView, CustomTokenRefreshView, LogoutView, StudentAttendanceLogHistoryView, StudentParentListView, StudentPassRequestView, AdminPassRequestListView, AdminApprovePassView, AdminRejectPassView, AdminGetStudentInfo, AdminGetParentInfo, AdminStudentListView, AdminParentListView
+from .views import ParentRegistrationView, ParentProfileView, DemoStudentLoginView, StudentProfileView, StudentScheduleView, ScanLogView, CreateBusPassView, AdminScanLogView, StudentScheduleReportView, ParentChildrenListView, LinkChildView, ParentChildLogView, CustomTokenObtainPairView, CustomTokenRefreshView, LogoutView, StudentAttendanceLogHistoryView, StudentParentListView, StudentPassRequestView, AdminPassRequestListView, AdminApprovePassView, AdminRejectPassView, AdminGetStudentInfo, AdminGetParentInfo, AdminStudentListView, AdminParentListView, ReaderRosterSnapshotView, ReaderRosterDeltaView, ParentChildEventStreamView, AdminBusRidershipView, AdminAttendanceAnalyticsView, AdminAnomalyListView, AdminSearchAutocompleteView, BulkCreateBusPassView, AdminBatchPassDecisionView, AdminQueryStatsView, AdminTripListView, AdminTripDetailView
 from rest_framework_simplejwt.views import (
     TokenObtainPairView, TokenRefreshView
 )
@@ -13,6 +13,7 @@ urlpatterns = [
     path('parents/me/', ParentProfileView.as_view(), name='parent-profile'),
     path('parents/me/children/', ParentChildrenListView.as_view(), name='parent-children-list'),
     path('parents/me/link-child/', LinkChildView.as_view(), name='parent-link-child'),
+    path('parents/me/children/events/', ParentChildEventStreamView.as_view(), name='parent-children-events'),
     path('parents/me/children/<str:university_id>/logs/', ParentChildLogView.as_view(), name='parent-child-logs'),
     
     path('students/demo-login/', DemoStudentLoginView.as_view(), name='demo-student-login'),
@@ -23,16 +24,27 @@ urlpatterns = [
     path('students/requests/', StudentPassRequestView.as_view(), name='student-pass-requests'),
 
     path('logs/scan/', ScanLogView.as_view(), name='scan-log'),
+    path('readers/roster/', ReaderRosterSnapshotView.as_view(), name='reader-roster-snapshot'),
+    path('readers/roster/delta/', ReaderRosterDeltaView.as_view(), name='reader-roster-delta'),
     
 
     path('admin/bus-pass/create/', CreateBusPassView.as_view(), name='admin-create-pass'),
+    path('admin/bus-pass/bulk-create/', BulkCreateBusPassView.as_view(), name='admin-bulk-create-pass'),
     path('admin/scan-logs/', AdminScanLogView.as_view(), name='admin-scan-logs'),
+    path('admin/ridership/', AdminBusRidershipView.as_view(), name='admin-bus-ridership'),
+    path('admin/trips/', AdminTripListView.as_view(), name='admin-trip-list'),
+    path('admin/trips/<int:pk>/', AdminTripDetailView.as_view(), name='admin-trip-detail'),
+    path('admin/query-stats/', AdminQueryStatsView.as_view(), name='admin-query-stats'),
+    path('admin/analytics/', AdminAttendanceAnalyticsView.as_view(), name='admin-attendance-analytics'),
+    path('admin/anomalies/', AdminAnomalyListView.as_view(), name='admin-anomaly-list'),
     path('admin/student-report/', StudentScheduleReportView.as_view(), name='admin-student-report'),
     path('admin/requests/', AdminPassRequestListView.as_view(), name='admin-request-list'),
+    path('admin/requests/batch/', AdminBatchPassDecisionView.as_view(), name='admin-request-batch'),
     path('admin/requests/<int:pk>/approve/', AdminApprovePassView.as_view(), name='admin-request-approve'),
     path('admin/requests/<int:pk>/reject/', AdminRejectPassView.as_view(), name='admin-request-reject'),
     path('admin/students/<str:university_id>/', AdminGetStudentInfo.as_view(), name='admin-student-info'),
     path('admin/parents/<int:pk>/', AdminGetParentInfo.as_view(), name='admin-parent-info'),
     path('admin/students/', AdminStudentListView.as_view(), name='admin-student-list'),
     path('admin/parents/', AdminParentListView.as_view(), name='admin-parent-list'),
+    path('admin/search/autocomplete/', AdminSearchAutocompleteView.as_view(), name='admin-search-autocomplete'),
 ]
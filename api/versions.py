@@ -0,0 +1,56 @@
+"""
+Version counters for per-process caches (the reader registry, compiled
+schedules). The counter lives in a database row rather than in
+django.core.cache, whose default local-memory backend is private to
+each process: a bump made by a management command or another worker would
+never be seen. Each process polls the row at most every
+SHARED_VERSION_CHECK_SECONDS, so a change reaches every worker within that
+delay at the cost of one indexed query per interval.
+"""
+import threading
+import time
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+from .models import SharedVersion
+
+
+class VersionCounter:
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+
+    def _alias(self):
+        # Always the primary: a lagging replica would hide recent bumps.
+        return DEFAULT_DB_ALIAS
+
+    def current(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._version is not None and now - self._checked_at < settings.SHARED_VERSION_CHECK_SECONDS:
+                return self._version
+
+        version = SharedVersion.objects.using(self._alias()).filter(name=self.name).values_list('version', flat=True).first()
+        with self._lock:
+            self._version = version or 0
+            self._checked_at = now
+            return self._version
+
+    def bump(self):
+        """Increments the counter once the current transaction commits."""
+        alias = self._alias()
+        transaction.on_commit(self._increment, using=alias)
+
+    def _increment(self):
+        alias = self._alias()
+        with transaction.atomic(using=alias):
+            updated = SharedVersion.objects.using(alias).filter(name=self.name).update(version=F('version') + 1)
+            if not updated:
+                SharedVersion.objects.using(alias).get_or_create(name=self.name, defaults={'version': 1})
+            # The row stays locked until commit, so this reads our own increment.
+            version = SharedVersion.objects.using(alias).filter(name=self.name).values_list('version', flat=True).first()
+        with self._lock:
+            self._version = version
+            self._checked_at = time.monotonic()
@@ -3,11 +3,10 @@ from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser, SAFE_METHODS
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.pagination import PageNumberPagination
-from rest_framework import filters
-from .models import Parent, Student, AttendanceLog, StudentBusPass, BusPassRequest
+from .models import Parent, Student, AttendanceLog, StudentBusPass, BusPassRequest, AttendanceAnomaly, Trip
 from .serializers import (
     ParentRegistrationSerializer,
     ParentProfileSerializer,
@@ -20,20 +19,46 @@ from .serializers import (
     ParentBasicProfileSerializer,
     BusPassRequestSerializer,
     AdminStudentDetailSerializer,
-    AdminParentDetailSerializer
+    AdminParentDetailSerializer,
+    AdminStudentListSerializer,
+    AdminParentListSerializer,
+    AttendanceAnomalySerializer,
+    BulkBusPassSerializer,
+    BatchPassDecisionSerializer,
+    TripSerializer
 )
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from datetime import timedelta 
 from django.conf import settings
-import pandas as pd
+import csv
 import os
 from django.contrib.auth.models import User
-from django.db import transaction, IntegrityError
+from django.db import router, transaction, IntegrityError
+from django.db.models import Count, Prefetch
+from django.utils.decorators import method_decorator
+from django.views.decorators.gzip import gzip_page
 from django.utils import timezone
 from datetime import datetime, time
+import asyncio
+import json
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from .permissions import APIKeyCheck
-from .schedule_utils import get_student_schedule_by_id, get_all_schedules
+from .schedule_utils import WEEKDAY_CODES, get_schedule_table, is_scheduled_at
+from .roster import RosterSnapshotRequired, record_roster_change, build_roster_snapshot, build_roster_delta
+from .events import scan_event_hub, publish_scan_event
+from .ridership import get_bus_ridership
+from .trips import record_trip_scan
+from .archive import read_archived_logs, filter_archived_logs
+from .search import NormalizedSearchFilter, autocomplete
+from .pass_index import filter_passes_covering, get_pass_index
+from .throttling import IPTokenBucketThrottle, UserTokenBucketThrottle, APIKeyTokenBucketThrottle
+from .db_routers import route_reads_to_replica
+from .querystats import query_stats, SORT_FIELDS
+from .renderers import FastJSONRenderer, FloatJSONRenderer, FastJSONParser, ScanRecordParser, ScanResultRenderer, EventStreamRenderer
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.parsers import FormParser, MultiPartParser
 from django_filters.rest_framework import DjangoFilterBackend
 
 
@@ -66,12 +91,25 @@ def set_auth_cookies(response, access_token, refresh_token=None):
 
 class Paginator(PageNumberPagination):
     page_size = 10
-    page_size_query_params = 'page_size'
+    page_size_query_param = 'page_size'
     max_page_size = 100
 
+class ReportingReplicaMixin:
+    """
+    Read-only requests to reporting views are served from the reporting
+    replica once authentication and permission checks (which stay on the
+    primary) have passed.
+    """
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            route_reads_to_replica(request)
+
 class CustomTokenObtainPairView(TokenObtainPairView):
    
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = [IPTokenBucketThrottle]
+    throttle_scope = 'login'
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -133,6 +171,8 @@ class LogoutView(APIView):
 
 class ParentRegistrationView(APIView):
     permission_classes = [AllowAny] 
+    throttle_classes = [IPTokenBucketThrottle]
+    throttle_scope = 'register'
 
     def post(self, request, *args, **kwargs):
         serializer = ParentRegistrationSerializer(data=request.data)
@@ -195,6 +235,8 @@ class ParentChildrenListView(APIView):
 
 class LinkChildView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [UserTokenBucketThrottle]
+    throttle_scope = 'link_child'
 
     def post(self, request, *args, **kwargs):
         try:
@@ -226,6 +268,7 @@ class LinkChildView(APIView):
 class ParentChildLogView(APIView):
     serializer_class = AttendanceLogSerializer
     permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     
     filter_backends = [DjangoFilterBackend]
     filterset_fields = {
@@ -250,7 +293,7 @@ class ParentChildLogView(APIView):
             if not parent_profile.children.filter(pk=student.pk).exists():
                 raise PermissionDenied("You do not have permission to view this student's logs.")
 
-            queryset = AttendanceLog.objects.filter(student=student).order_by('-timestamp')
+            queryset = AttendanceLog.objects.filter(student=student).prefetch_related('student__user').order_by('-timestamp')
             
             filtered_queryset = self.filter_queryset(queryset)
             
@@ -270,6 +313,48 @@ class ParentChildLogView(APIView):
             return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+SSE_KEEPALIVE_SECONDS = 20
+
+async def stream_scan_events(university_ids):
+    subscription = scan_event_hub.subscribe(university_ids)
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: scan\ndata: {json.dumps(event)}\n\n"
+    finally:
+        subscription.close()
+
+class ParentChildEventStreamView(APIView):
+    """
+    Server-sent events feed of new scans for the caller's linked children.
+    Needs an ASGI server: an idle connection is just a parked coroutine,
+    whereas under WSGI it would pin a worker thread for its whole lifetime.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, EventStreamRenderer]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            parent_profile = self.request.user.parent_profile
+        except Parent.DoesNotExist:
+            return Response({"error": "Parent profile not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        if not isinstance(request._request, ASGIRequest):
+            return Response({"error": "Live scan events require the ASGI server."}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        university_ids = list(parent_profile.children.values_list('university_id', flat=True))
+
+        response = StreamingHttpResponse(stream_scan_events(university_ids), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
 class StudentProfileView(APIView):
     serializer_class = StudentProfileSerializer
     permission_classes = [IsAuthenticated] 
@@ -303,6 +388,8 @@ class StudentScheduleView(APIView):
 
 class DemoStudentLoginView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [IPTokenBucketThrottle]
+    throttle_scope = 'demo_login'
 
     @transaction.atomic
     def post(self, request, *args, **kwargs):
@@ -314,13 +401,17 @@ class DemoStudentLoginView(APIView):
         csv_file_path = os.path.join(settings.BASE_DIR, 'students.csv')
         
         try:
-            df = pd.read_csv(csv_file_path, dtype=str)
-            student_data = df[df['university_email'].str.lower() == email]
+            with open(csv_file_path, newline='') as f:
+                student_row = next(
+                    (row for row in csv.DictReader(f) if row['university_email'].lower() == email),
+                    None
+                )
             
-            if student_data.empty:
+            if student_row is None:
                 return Response({"error": "Email not found in student directory (students.csv)."}, status=status.HTTP_404_NOT_FOUND)
             
-            student_row = student_data.iloc[0].to_dict()
+            # Blank cells mean "no value", as they did when read through pandas.
+            student_row = {key: value or None for key, value in student_row.items()}
             
             student_profile, created_student = Student.objects.get_or_create(
                 university_id=str(student_row['university_id']),
@@ -374,13 +465,78 @@ class DemoStudentLoginView(APIView):
             return Response({"error": f"An unexpected error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def parse_scan_timestamp(value):
+    """
+    Scan times arrive as ISO 8601 strings (a trailing Z is accepted) or, from
+    the binary scan format, as datetimes already. Raises ValueError.
+    """
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+def consume_active_pass(student, scan_timestamp):
+    """
+    Marks one unused pass covering scan_timestamp as used and returns its id,
+    or None if the student has no such pass.
+
+    Each candidate is claimed with a conditional UPDATE (used_at IS NULL), so
+    two readers scanning the same student at once can never consume the same
+    pass: only one UPDATE matches the row, the other moves on to the next one.
+    """
+    candidate_ids = filter_passes_covering(
+        StudentBusPass.objects.filter(student=student, used_at__isnull=True),
+        scan_timestamp
+    ).order_by('valid_until').values_list('pk', flat=True)
+
+    for pass_id in candidate_ids:
+        claimed = StudentBusPass.objects.filter(
+            pk=pass_id,
+            used_at__isnull=True
+        ).update(used_at=scan_timestamp)
+
+        if claimed:
+            record_roster_change(student.university_id)
+            return pass_id
+
+    return None
+
+def release_pass(student, pass_id, scan_timestamp):
+    """Undoes consume_active_pass for a scan whose log could not be written."""
+    released = StudentBusPass.objects.filter(pk=pass_id, used_at=scan_timestamp).update(used_at=None)
+    if released:
+        record_roster_change(student.university_id)
+
+def record_scan_log(student, scan_timestamp, bus_number, direction, status):
+    """Creates the AttendanceLog for a scan, filed under its trip."""
+    with transaction.atomic(using=router.db_for_write(AttendanceLog)):
+        return AttendanceLog.objects.create(
+            student=student,
+            timestamp=scan_timestamp,
+            bus_number=bus_number,
+            status=status,
+            direction=direction,
+            trip=record_trip_scan(bus_number, direction, scan_timestamp)
+        )
+
+
 class ScanLogView(APIView):
     permission_classes = [APIKeyCheck]
+    parser_classes = [FastJSONParser, ScanRecordParser, FormParser, MultiPartParser]
+    renderer_classes = [FastJSONRenderer, ScanResultRenderer]
+    throttle_classes = [APIKeyTokenBucketThrottle]
+    throttle_scope = 'reader_scan'
 
-    @transaction.atomic
     def post(self, request, *args, **kwargs):
+        if isinstance(request.data, list):
+            return Response({"error": "Send one scan per request."}, status=status.HTTP_400_BAD_REQUEST)
+
         student_rfid = request.data.get('student_rfid')
         bus_number = request.data.get('bus_number')
+
+        # A registered reader's bus assignment is authoritative.
+        reader = getattr(request, 'bus_reader', None)
+        if reader and reader.bus_number:
+            bus_number = reader.bus_number
         scan_timestamp_str = request.data.get('scan_timestamp')
         direction_input = request.data.get('direction', 'INBOUND').upper()
 
@@ -388,7 +544,7 @@ class ScanLogView(APIView):
             return Response({"error": "student_rfid and scan_timestamp are required."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            scan_timestamp = datetime.fromisoformat(scan_timestamp_str.replace('Z', '+00:00'))
+            scan_timestamp = parse_scan_timestamp(scan_timestamp_str)
         except ValueError:
             return Response({"error": "Invalid timestamp format. Must be ISO 8601."}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -400,7 +556,9 @@ class ScanLogView(APIView):
         
         direction_input = request.data.get('direction')
         if not direction_input:
-            hour = scan_timestamp.hour
+            # Binary scans arrive in UTC and JSON ones in whatever offset the
+            # reader sent; judge the hour in local time for both.
+            hour = timezone.localtime(scan_timestamp).hour
             if hour < 12:
                 direction_input = 'INBOUND'
             else:
@@ -413,70 +571,144 @@ class ScanLogView(APIView):
         except Student.DoesNotExist:
             return Response({"error": "Student ID not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        active_pass = StudentBusPass.objects.filter(
-            student=student,
-            valid_from__lte=scan_timestamp,
-            valid_until__gte=scan_timestamp,
-            used_at__isnull=True
-        ).first()
-
-        if active_pass:
-            active_pass.used_at = scan_timestamp
-            active_pass.save()
-            AttendanceLog.objects.create(
-                student=student,
-                timestamp=scan_timestamp,
-                bus_number=bus_number,
-                status=AttendanceLog.ScanStatus.OVERRIDE,
-                direction=direction_input
-            )
+        # With one database the pass and its OVERRIDE log commit together.
+        # With logs in a separate database they cannot: the pass is claimed
+        # and committed first, then the log is written, and a failed log
+        # write releases the pass again. A crash between the two commits
+        # still leaves a used pass with no OVERRIDE log.
+        logs_apart = router.db_for_write(AttendanceLog) != router.db_for_write(StudentBusPass)
+        with transaction.atomic():
+            used_pass_id = consume_active_pass(student, scan_timestamp)
+            if used_pass_id and not logs_apart:
+                log = record_scan_log(student, scan_timestamp, bus_number, direction_input, AttendanceLog.ScanStatus.OVERRIDE)
+                publish_scan_event(log)
+
+        if used_pass_id and logs_apart:
+            try:
+                log = record_scan_log(student, scan_timestamp, bus_number, direction_input, AttendanceLog.ScanStatus.OVERRIDE)
+            except Exception:
+                release_pass(student, used_pass_id, scan_timestamp)
+                raise
+            publish_scan_event(log)
+
+        if used_pass_id:
             return Response({"status": "VALID", "reason": "Admin Pass Used"}, status=status.HTTP_200_OK)
 
         try:
-            schedule_data = get_student_schedule_by_id(student.schedule_id)
-            valid_days_list = schedule_data.get('days_list', [])
+            is_valid_schedule = is_scheduled_at(student.schedule_id, scan_timestamp)
         except Exception as e:
             print(f"Error building schedule for {student_rfid}: {e}")
             return Response({"error": f"Could not validate schedule: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        scan_day_short = scan_timestamp.strftime("%a")[:2]
-        
-        is_valid_schedule = (scan_day_short in valid_days_list)
-
         if is_valid_schedule:
-            AttendanceLog.objects.create(
-                student=student,
-                timestamp=scan_timestamp,
-                bus_number=bus_number,
-                direction=direction_input,
-                status=AttendanceLog.ScanStatus.VALID
-            )
+            log = record_scan_log(student, scan_timestamp, bus_number, direction_input, AttendanceLog.ScanStatus.VALID)
+            publish_scan_event(log)
             return Response({"status": "VALID", "reason": "Schedule Matched"}, status=status.HTTP_200_OK)
         else:
-            AttendanceLog.objects.create(
-                student=student,
-                timestamp=scan_timestamp,
-                bus_number=bus_number,
-                direction=direction_input,
-                status=AttendanceLog.ScanStatus.INVALID,
-                
-            )
+            log = record_scan_log(student, scan_timestamp, bus_number, direction_input, AttendanceLog.ScanStatus.INVALID)
+            publish_scan_event(log)
             return Response({"status": "INVALID", "reason": "Not on Schedule"}, status=status.HTTP_403_FORBIDDEN)
 
+@method_decorator(gzip_page, name='dispatch')
+class ReaderRosterSnapshotView(APIView):
+    """
+    Full offline validation roster for bus readers. Readers fetch this once,
+    then keep it current through ReaderRosterDeltaView.
+    """
+    permission_classes = [APIKeyCheck]
+    renderer_classes = [FastJSONRenderer]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            return Response(build_roster_snapshot(), status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response({"error": f"Could not build roster: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@method_decorator(gzip_page, name='dispatch')
+class ReaderRosterDeltaView(APIView):
+    permission_classes = [APIKeyCheck]
+    renderer_classes = [FastJSONRenderer]
+
+    def get(self, request, *args, **kwargs):
+        since = request.query_params.get('since')
+        schedule_version = request.query_params.get('schedule_version')
+
+        try:
+            since_version = int(since)
+        except (TypeError, ValueError):
+            return Response({"error": "since must be a roster version number."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            return Response(build_roster_delta(since_version, schedule_version), status=status.HTTP_200_OK)
+        except RosterSnapshotRequired:
+            return Response(
+                {"error": "Roster version too old; fetch a full snapshot.", "snapshot_required": True},
+                status=status.HTTP_410_GONE
+            )
+        except Exception as e:
+            return Response({"error": f"Could not build roster delta: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 class CreateBusPassView(generics.CreateAPIView):
     queryset = StudentBusPass.objects.all()
     serializer_class = StudentBusPassSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]
 
     def perform_create(self, serializer):
+        data = serializer.validated_data
+        self.overlapping_pass_ids = get_pass_index().overlapping_passes(
+            data['student'].id, data['valid_from'], data['valid_until']
+        )
         serializer.save(admin_who_granted=self.request.user)
 
-class AdminScanLogView(generics.ListAPIView):
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        # Duplicates are allowed, but the admin is told which unused passes
+        # already cover part of the new window.
+        response.data['overlapping_pass_ids'] = self.overlapping_pass_ids
+        return response
+
+class BulkCreateBusPassView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        serializer = BulkBusPassSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        students = data['students']
+
+        pass_index = get_pass_index()
+        overlapping_ids = sorted(
+            student.university_id for student in students
+            if pass_index.overlapping_passes(student.id, data['valid_from'], data['valid_until'])
+        )
+
+        with transaction.atomic():
+            StudentBusPass.objects.bulk_create([
+                StudentBusPass(
+                    student=student,
+                    admin_who_granted=request.user,
+                    reason=data['reason'],
+                    valid_from=data['valid_from'],
+                    valid_until=data['valid_until']
+                )
+                for student in students
+            ], batch_size=1000)
+            # bulk_create skips post_save, so cached pass data is invalidated here in one sweep.
+            record_roster_change(*(student.university_id for student in students))
+
+        return Response({
+            "message": f"Created {len(students)} bus passes.",
+            "created": len(students),
+            "university_ids": sorted(student.university_id for student in students),
+            "overlapping_university_ids": overlapping_ids
+        }, status=status.HTTP_201_CREATED)
+
+class AdminScanLogView(ReportingReplicaMixin, generics.ListAPIView):
     serializer_class = AttendanceLogSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = {
-        'student__university_id': ['exact'],
         'status': ['exact'],
         'bus_number': ['exact'],
         'timestamp': ['date']
@@ -486,52 +718,197 @@ class AdminScanLogView(generics.ListAPIView):
         params = self.request.query_params
        
         if params:
-            return AttendanceLog.objects.all().order_by('-timestamp')
-        
-        today = timezone.now().date()
-        return AttendanceLog.objects.filter(timestamp__date=today).order_by('-timestamp')
+            queryset = AttendanceLog.objects.all()
+        else:
+            today = timezone.now().date()
+            queryset = AttendanceLog.objects.filter(timestamp__date=today)
+
+        # Logs may be stored apart from students, so filter on ids, not a join.
+        university_id = params.get('student__university_id')
+        if university_id:
+            student_ids = list(Student.objects.filter(university_id=university_id).values_list('id', flat=True))
+            queryset = queryset.filter(student_id__in=student_ids)
+
+        return queryset.prefetch_related('student__user').order_by('-timestamp')
 
-class StudentScheduleReportView(APIView):
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+
+        scan_date = request.query_params.get('timestamp__date')
+        if not scan_date:
+            return response
+
+        try:
+            scan_date = datetime.strptime(scan_date, '%Y-%m-%d').date()
+        except ValueError:
+            return response
+
+        archived = read_archived_logs(scan_date, scan_date, university_id=request.query_params.get('student__university_id'))
+        archived = filter_archived_logs(archived, request.query_params, ['status', 'bus_number'])
+        if archived:
+            response.data = list(response.data) + archived
+        return response
+
+class AdminBusRidershipView(APIView):
+    """
+    Live per-bus scan counts from this worker's in-memory RidershipCounters.
+    They are loaded from the database once, then kept current by scan events
+    from SCAN_EVENT_BACKEND. The default LocalScanEventBackend only delivers
+    scans handled by the same process, so the counts are complete only with
+    a single worker; with several, configure a cross-process backend or
+    each worker will miss the others' scans since its first load.
+    """
     permission_classes = [IsAuthenticated, IsAdminUser]
 
+    def get(self, request, *args, **kwargs):
+        try:
+            minutes = int(request.query_params.get('minutes', 15))
+        except ValueError:
+            return Response({"error": "minutes must be a whole number."}, status=status.HTTP_400_BAD_REQUEST)
+
+        minutes = max(1, min(minutes, settings.RIDERSHIP_WINDOW_MINUTES))
+
+        return Response({
+            "date": timezone.localdate(),
+            "minutes": minutes,
+            "buses": get_bus_ridership(minutes)
+        }, status=status.HTTP_200_OK)
+
+class AdminTripListView(ReportingReplicaMixin, generics.ListAPIView):
+    """
+    Trips started on ?date= (YYYY-MM-DD, default today), optionally for one
+    bus_number and direction, latest first.
+    """
+    serializer_class = TripSerializer
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['bus_number', 'direction']
+
+    def get_queryset(self):
+        trip_date = self.request.query_params.get('date')
+        try:
+            trip_date = datetime.strptime(trip_date, '%Y-%m-%d').date() if trip_date else timezone.localdate()
+        except ValueError:
+            return Trip.objects.none()
+        return Trip.objects.filter(started_at__date=trip_date).order_by('-started_at')
+
+class AdminTripDetailView(ReportingReplicaMixin, APIView):
+    """One trip and its scans in the order they happened."""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def get(self, request, pk, *args, **kwargs):
+        trip = Trip.objects.filter(pk=pk).first()
+        if trip is None:
+            return Response({"error": "Trip not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        logs = trip.logs.prefetch_related('student__user').order_by('timestamp')
+        return Response({
+            "trip": TripSerializer(trip).data,
+            "scans": AttendanceLogSerializer(logs, many=True).data,
+        }, status=status.HTTP_200_OK)
+
+class AdminQueryStatsView(APIView):
+    """
+    Top SQL fingerprints recorded by this worker since start-up or the last
+    reset, sorted by total time unless ?sort= names another field.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    renderer_classes = [FloatJSONRenderer, BrowsableAPIRenderer]
+
+    def get(self, request, *args, **kwargs):
+        sort = request.query_params.get('sort', 'total_ms')
+        if sort not in SORT_FIELDS:
+            return Response({"error": f"sort must be one of: {', '.join(SORT_FIELDS)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), 200))
+        except ValueError:
+            return Response({"error": "limit must be a whole number."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "pid": os.getpid(),
+            "since": query_stats.started_at,
+            "queries": query_stats.top(sort=sort, limit=limit, view=request.query_params.get('view'))
+        }, status=status.HTTP_200_OK)
+
+    def delete(self, request, *args, **kwargs):
+        query_stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class AdminAttendanceAnalyticsView(ReportingReplicaMixin, APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    renderer_classes = [FloatJSONRenderer, BrowsableAPIRenderer]
+
+    def get(self, request, *args, **kwargs):
+        today = timezone.localdate()
+
+        try:
+            from_date = datetime.strptime(request.query_params.get('from_date'), '%Y-%m-%d').date() if request.query_params.get('from_date') else today - timedelta(days=30)
+            to_date = datetime.strptime(request.query_params.get('to_date'), '%Y-%m-%d').date() if request.query_params.get('to_date') else today
+        except ValueError:
+            return Response({"error": "Dates must be in YYYY-MM-DD format."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if from_date > to_date:
+            return Response({"error": "from_date must not be after to_date."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Imported here so pandas/numpy load only in workers that serve analytics.
+        from .analytics import compute_attendance_metrics
+
+        try:
+            return Response(compute_attendance_metrics(from_date, to_date), status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response({"error": f"Could not compute analytics: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class AdminAnomalyListView(ReportingReplicaMixin, generics.ListAPIView):
+    queryset = AttendanceAnomaly.objects.select_related('student')
+    serializer_class = AttendanceAnomalySerializer
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    pagination_class = Paginator
+
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = {
+        'kind': ['exact'],
+        'student__university_id': ['exact'],
+        'bus_number': ['exact'],
+        'date': ['exact', 'gte', 'lte']
+    }
+
+class StudentScheduleReportView(ReportingReplicaMixin, APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
     def get(self, request, *args, **kwargs):
         report_time = timezone.now()
         
         day_query = request.query_params.get('day')
         
         if not day_query:
-            day_name = report_time.strftime("%A")
+            weekday = timezone.localtime(report_time).weekday()
         else:
-            day_name = day_query
-        
-        day_query_short = day_name[:2].title()
+            day_query_short = day_query[:2].title()
+            weekday = WEEKDAY_CODES.index(day_query_short) if day_query_short in WEEKDAY_CODES else None
         
         try:
-            all_schedules = get_all_schedules()
+            schedules = get_schedule_table().schedules
             all_students = Student.objects.select_related('user').all()
+            covered_student_ids = get_pass_index().covered_students(report_time)
             report = []
 
             for student in all_students:
                 is_valid_today = False
                 
-            
-                has_active_pass = StudentBusPass.objects.filter(
-                    student=student,
-                    valid_from__lte=report_time,
-                    valid_until__gte=report_time,
-                    used_at__isnull=True
-                ).exists()
+                has_active_pass = student.id in covered_student_ids
 
                 if has_active_pass:
                     is_valid_today = True
                 else:
-                    if student.schedule_id:
-                        student_schedule_info = all_schedules.get(str(student.schedule_id))
+                    if student.schedule_id and weekday is not None:
+                        schedule = schedules.get(str(student.schedule_id))
                         
-                        if student_schedule_info:
-                            valid_days = student_schedule_info.get('days_list', [])
-                            if day_query_short in valid_days:
-                                is_valid_today = True
+                        if schedule and schedule.runs_on(weekday):
+                            is_valid_today = True
                 
                 if is_valid_today:
                     student_data = {
@@ -550,6 +927,7 @@ class StudentScheduleReportView(APIView):
 class StudentAttendanceLogHistoryView(ListAPIView):
     serializer_class = AttendanceLogSerializer
     permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
 
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['status', 'bus_number', 'direction']
@@ -572,7 +950,29 @@ class StudentAttendanceLogHistoryView(ListAPIView):
             thirty_days_ago = timezone.now() - timedelta(days=30)
             queryset = queryset.filter(timestamp__gte=thirty_days_ago)
 
-        return queryset.order_by('-timestamp')
+        return queryset.prefetch_related('student__user').order_by('-timestamp')
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+
+        from_date = request.query_params.get('from_date')
+        to_date = request.query_params.get('to_date')
+        if not from_date or not hasattr(request.user, 'student_profile'):
+            return response
+
+        try:
+            from_date = datetime.strptime(from_date, '%Y-%m-%d').date()
+            to_date = datetime.strptime(to_date, '%Y-%m-%d').date() if to_date else timezone.localdate()
+        except ValueError:
+            return response
+
+        # Older logs may have been moved to the archive; they are always older
+        # than anything still live, so they go after the live rows.
+        archived = read_archived_logs(from_date, to_date, university_id=request.user.student_profile.university_id)
+        archived = filter_archived_logs(archived, request.query_params, self.filterset_fields)
+        if archived:
+            response.data = list(response.data) + archived
+        return response
     
 
 class StudentParentListView(generics.ListAPIView):
@@ -607,7 +1007,7 @@ class StudentPassRequestView(generics.ListCreateAPIView):
         except Student.DoesNotExist:
             return BusPassRequest.objects.none()
         
-        queryset = BusPassRequest.objects.filter(student=student).order_by('-request_date')
+        queryset = BusPassRequest.objects.filter(student=student).select_related('student__user').order_by('-request_date')
 
         params = self.request.query_params
 
@@ -625,15 +1025,16 @@ class StudentPassRequestView(generics.ListCreateAPIView):
         except Student.DoesNotExist:
              pass 
 
-class AdminPassRequestListView(generics.ListAPIView):
+class AdminPassRequestListView(ReportingReplicaMixin, generics.ListAPIView):
 
     serializer_class = BusPassRequestSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]
+    pagination_class = Paginator
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['status', 'student__university_id']
 
     def get_queryset(self):
-        queryset = BusPassRequest.objects.all()
+        queryset = BusPassRequest.objects.select_related('student__user')
         status_param = self.request.query_params.get('status')
         if not status_param:
             queryset = queryset.filter(status=BusPassRequest.RequestStatus.PENDING)
@@ -697,12 +1098,90 @@ class AdminRejectPassView(APIView):
     
 
 
-class AdminGetStudentInfo(APIView):
+class AdminBatchPassDecisionView(APIView):
+    """
+    Approves or rejects many pass requests in one transaction. All pending
+    rows are locked with one query, passes are inserted with bulk_create and
+    the requests saved with bulk_update; each item gets its own result.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        serializer = BatchPassDecisionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['items']
+
+        results = []
+        new_passes = []
+        decided_requests = []
+
+        with transaction.atomic():
+            pending_requests = {
+                pass_request.pk: pass_request
+                for pass_request in BusPassRequest.objects.select_for_update(of=('self',)).select_related('student').filter(
+                    pk__in=[item['id'] for item in items],
+                    status=BusPassRequest.RequestStatus.PENDING
+                )
+            }
+
+            for item in items:
+                pass_request = pending_requests.get(item['id'])
+                if pass_request is None:
+                    results.append({"id": item['id'], "error": "Request not found or already processed."})
+                    continue
+
+                if item['action'] == 'reject':
+                    pass_request.status = BusPassRequest.RequestStatus.REJECTED
+                    pass_request.admin_notes = item.get('admin_notes', 'Rejected by admin.')
+                    decided_requests.append(pass_request)
+                    results.append({"id": pass_request.pk, "status": pass_request.status})
+                    continue
+
+                final_valid_from = item.get('valid_from', pass_request.requested_valid_from)
+                final_valid_until = item.get('valid_until', pass_request.requested_valid_until)
+                if final_valid_from >= final_valid_until:
+                    results.append({"id": pass_request.pk, "error": "valid_from must be before valid_until."})
+                    continue
+
+                new_passes.append(StudentBusPass(
+                    student=pass_request.student,
+                    admin_who_granted=request.user,
+                    reason=f"Approved Request: {pass_request.reason}",
+                    valid_from=final_valid_from,
+                    valid_until=final_valid_until
+                ))
+
+                pass_request.status = BusPassRequest.RequestStatus.APPROVED
+                pass_request.admin_notes = item.get('admin_notes', 'Approved by admin.')
+                pass_request.approved_valid_from = final_valid_from
+                pass_request.approved_valid_until = final_valid_until
+                decided_requests.append(pass_request)
+                results.append({
+                    "id": pass_request.pk,
+                    "status": pass_request.status,
+                    "valid_from": final_valid_from,
+                    "valid_until": final_valid_until
+                })
+
+            StudentBusPass.objects.bulk_create(new_passes, batch_size=1000)
+            BusPassRequest.objects.bulk_update(
+                decided_requests,
+                ['status', 'admin_notes', 'approved_valid_from', 'approved_valid_until'],
+                batch_size=1000
+            )
+            record_roster_change(*(bus_pass.student.university_id for bus_pass in new_passes))
+
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+class AdminGetStudentInfo(ReportingReplicaMixin, APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
 
     def get(self, request, university_id, *args, **kwargs):
         try:
-            student = Student.objects.get(university_id=university_id)
+            student = Student.objects.select_related('user').prefetch_related(
+                Prefetch('parents', queryset=Parent.objects.select_related('user'))
+            ).get(university_id=university_id)
             
             serializer = AdminStudentDetailSerializer(student)
             
@@ -719,13 +1198,15 @@ class AdminGetStudentInfo(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-class AdminGetParentInfo(APIView):
+class AdminGetParentInfo(ReportingReplicaMixin, APIView):
 
     permission_classes = [IsAuthenticated, IsAdminUser]
 
     def get(self, request, pk, *args, **kwargs):
         try:
-            parent = Parent.objects.get(pk=pk)
+            parent = Parent.objects.select_related('user').prefetch_related(
+                Prefetch('children', queryset=Student.objects.select_related('user'))
+            ).get(pk=pk)
            
             serializer = AdminParentDetailSerializer(parent)
             
@@ -742,18 +1223,31 @@ class AdminGetParentInfo(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-class AdminStudentListView(generics.ListAPIView):
-    queryset = Student.objects.all().order_by('university_id')
-    serializer_class = AdminStudentDetailSerializer 
+class AdminStudentListView(ReportingReplicaMixin, generics.ListAPIView):
+    queryset = Student.objects.select_related('user').annotate(parent_count=Count('parents')).order_by('university_id')
+    serializer_class = AdminStudentListSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]
+    pagination_class = Paginator
     
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['university_id', 'university_email', 'user__first_name', 'user__last_name']
+    filter_backends = [NormalizedSearchFilter]
 
-class AdminParentListView(generics.ListAPIView):
-    queryset = Parent.objects.all().order_by('id')
-    serializer_class = AdminParentDetailSerializer 
+class AdminParentListView(ReportingReplicaMixin, generics.ListAPIView):
+    queryset = Parent.objects.select_related('user').annotate(children_count=Count('children')).order_by('id')
+    serializer_class = AdminParentListSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]
+    pagination_class = Paginator
     
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['user__email', 'user__first_name', 'user__last_name', 'phone_number']
\ No newline at end of file
+    filter_backends = [NormalizedSearchFilter]
+
+
+class AdminSearchAutocompleteView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '')
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), 50)
+        except ValueError:
+            return Response({"error": "limit must be a whole number."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(autocomplete(query, limit), status=status.HTTP_200_OK)
\ No newline at end of file
@@ -31,12 +31,14 @@ ALLOWED_HOSTS = ['*']
 # ---
 
 INSTALLED_APPS = [
+    'daphne',                   # ASGI runserver; must come before staticfiles
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # --- 3rd Party Apps ---
     'corsheaders',              # For React frontend
@@ -57,6 +59,9 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.db_routers.PrimaryPinningMiddleware',
+    'api.profiling.RequestProfilerMiddleware',
+    'api.querystats.QueryStatsViewMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -82,6 +87,8 @@ TEMPLATES = [
 
 # This must also match your project folder's name (e.g., 'myproject')
 WSGI_APPLICATION = 'myproject.wsgi.application'
+# Served by daphne (see the Dockerfile); the live scan event stream needs ASGI.
+ASGI_APPLICATION = 'myproject.asgi.application'
 
 # ---
 # 3. DATABASE (Reading from Docker Environment)
@@ -104,6 +111,40 @@ DATABASES = {
     }
 }
 
+# Optional streaming replica for admin and reporting reads. Writes always
+# go to 'default'; see api/db_routers.py.
+DB_REPLICA_HOST = os.environ.get('POSTGRES_REPLICA_HOST')
+if DB_REPLICA_HOST:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': DB_REPLICA_HOST,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Optional separate database for AttendanceLog, so the append-heavy scan
+# log can be tuned, vacuumed and scaled apart from users, parents and
+# passes. Create its schema with the setup_attendance_db command.
+DB_ATTENDANCE_HOST = os.environ.get('POSTGRES_ATTENDANCE_HOST')
+if DB_ATTENDANCE_HOST:
+    DATABASES['attendance'] = {
+        **DATABASES['default'],
+        'NAME': os.environ.get('POSTGRES_ATTENDANCE_DB', DB_NAME),
+        'HOST': DB_ATTENDANCE_HOST,
+        'TEST': {'MIGRATE': False},
+    }
+
+DATABASE_ROUTERS = ['api.db_routers.AttendanceLogRouter', 'api.db_routers.ReportingReplicaRouter']
+REPORTING_DB_ALIAS = 'replica' if DB_REPLICA_HOST else None
+ATTENDANCE_DB_ALIAS = 'attendance' if DB_ATTENDANCE_HOST else None
+
+# After a write, the user reads from the primary for this many seconds so
+# they see their own changes.
+REPLICA_PIN_SECONDS = 5
+# Reporting reads fall back to the primary when the replica is further
+# behind than this; the lag is re-checked at most every REPLICA_LAG_CHECK_SECONDS.
+REPLICA_MAX_LAG_SECONDS = 2
+REPLICA_LAG_CHECK_SECONDS = 1
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -171,8 +212,25 @@ REST_FRAMEWORK = {
         # Enable filtering globally
         'django_filters.rest_framework.DjangoFilterBackend',
     ),
+    # Token bucket sizes for api.throttling: a burst of N, refilled at N per period.
+    'DEFAULT_THROTTLE_RATES': {
+        'login': '10/min',
+        'register': '5/min',
+        'demo_login': '10/min',
+        'link_child': '5/min',
+        # Per registered reader, or per IP for readers on the legacy shared
+        # key (see APIKeyTokenBucketThrottle). A full bus boarding at the
+        # door, around one scan a second for a minute or two, fits in the
+        # burst with room to spare.
+        'reader_scan': '120/min',
+    },
 }
 
+# 'local' keeps throttle buckets in each worker's memory; 'cache' keeps
+# them in the Django cache, which shares them across workers only when
+# CACHES points at a shared backend such as Redis.
+THROTTLE_BUCKET_STORE = os.environ.get('THROTTLE_BUCKET_STORE', 'local')
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
@@ -213,4 +271,59 @@ SESSION_COOKIE_SAMESITE = 'Lax'
 # ---
 
 # Your secret key for the bus scanner API
-BUS_API_KEY = os.environ.get('BUS_API_KEY')
\ No newline at end of file
+BUS_API_KEY = os.environ.get('BUS_API_KEY')
+
+# Where scan events are published for live parent feeds and the ridership
+# counters. The local backend only reaches listeners in the same process;
+# swap in a cross-process backend when running several workers.
+SCAN_EVENT_BACKEND = os.environ.get('SCAN_EVENT_BACKEND', 'api.events.LocalScanEventBackend')
+
+# Per-process caches (the reader registry, compiled schedules, the pass
+# and search indexes) learn about changes made by other workers and
+# management commands from the database (version rows in api/versions.py,
+# or change logs), polled at most this often. CACHES is left at Django's local-memory default, which is private
+# to each process; only per-process state such as throttle buckets belongs
+# there.
+SHARED_VERSION_CHECK_SECONDS = 2
+
+# Roster deltas keep re-sending changes younger than this many seconds, so
+# a change whose transaction commits after a reader has synced past its id
+# is still delivered (see api.roster.get_roster_version). Must exceed the
+# longest transaction that records a roster change.
+ROSTER_SETTLE_SECONDS = 60
+
+# Roster changes older than this are deleted by prune_roster_changes; a
+# reader whose last sync is older gets 410 from the delta endpoint and must
+# fetch a full snapshot.
+ROSTER_CHANGE_RETENTION_DAYS = 7
+
+# How long search index changes are kept for workers to catch up from. A
+# worker that has not synced for longer than this rebuilds its index.
+SEARCH_INDEX_CHANGE_RETENTION_SECONDS = 3600
+
+# How many minutes of per-bus scan counts are kept in memory for the live
+# ridership view.
+RIDERSHIP_WINDOW_MINUTES = 60
+
+# Scans on the same bus and direction at most this many minutes apart belong
+# to one trip (see api/trips.py and the rebuild_trips management command).
+TRIP_GAP_MINUTES = 20
+
+# Directory holding the compressed monthly archive of old attendance logs
+# (see the archive_attendance_logs management command).
+ATTENDANCE_ARCHIVE_ROOT = os.environ.get('ATTENDANCE_ARCHIVE_ROOT', os.path.join(BASE_DIR, 'archive'))
+
+
+# On-demand request profiling (see api/profiling.py). Admins can profile a
+# single request with the X-Profile-Request header; PROFILE_SAMPLE_RATE
+# profiles that fraction (0-1) of all requests.
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_SAMPLE_INTERVAL = 0.001
+PROFILE_OUTPUT_DIR = os.environ.get('PROFILE_OUTPUT_DIR', os.path.join(BASE_DIR, 'profiles'))
+
+# Per-process SQL statistics by query fingerprint and view (see
+# api/querystats.py and /api/admin/query-stats/). Stacks of queries slower
+# than QUERY_STATS_SLOW_MS are kept when QUERY_STATS_CAPTURE_STACKS is on.
+QUERY_STATS_ENABLED = os.environ.get('QUERY_STATS_ENABLED', 'true').lower() == 'true'
+QUERY_STATS_CAPTURE_STACKS = os.environ.get('QUERY_STATS_CAPTURE_STACKS', 'false').lower() == 'true'
+QUERY_STATS_SLOW_MS = 100